@@ -1,34 +1,50 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
 
+import customtkinter
+
+# Сборка в папку (onedir): onefile при каждом запуске распаковывает весь архив во временный каталог,
+# что и давало несколько секунд холодного старта. По той же причине отключен UPX.
+ctk_path = os.path.dirname(customtkinter.__file__)
 
 a = Analysis(
     ['gui_main.py'],
     pathex=[],
     binaries=[],
-    datas=[('C:\\Users\\unr-7\\Documents\\ITMO\\PHYSIC\\hydrogen_viz\\venv_build\\Lib\\site-packages\\customtkinter', 'customtkinter/')],
+    datas=[(ctk_path, 'customtkinter/')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=[
+        'scipy',
+        'pandas',
+        'IPython',
+        'jupyter',
+        'notebook',
+        'PyQt5',
+        'PyQt6',
+        'PySide2',
+        'PySide6',
+        'tkinter.test',
+        'matplotlib.tests',
+        'numpy.tests',
+    ],
     noarchive=False,
-    optimize=0,
+    optimize=1,
 )
 pyz = PYZ(a.pure)
 
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='HydrogenVisualizer',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,3 +52,13 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='HydrogenVisualizer',
+)
@@ -0,0 +1,73 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from core import profiling
+from core.autosize import auto_grid
+from core.dynamics import Superposition, parse_states
+from core.grid import Grid
+
+# Готовые суперпозиции: дипольные колебания 1s + 2p_z, вращение 2p(m=1) + 3d(m=2)
+# и стационарная 2p_x из m = ±1 (один кадр: разность энергий нулевая)
+PRESETS = {
+    "dipole": "1:1,0,0; 1:2,1,0",
+    "beat": "1:2,1,1; 1:3,2,2",
+    "px": "1:2,1,-1; -1:2,1,1",
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Анимация нестационарной суперпозиции состояний водорода")
+    parser.add_argument("states", help=f"'c:n,l,m; c:n,l,m' (c может быть комплексным, напр. 0.7j) "
+                                       f"или имя готовой: {', '.join(PRESETS)}")
+    parser.add_argument("--out", default="superposition.html", help=".html (Plotly), .gif или .mp4")
+    parser.add_argument("--resolution", type=int, default=64, help="узлов сетки по оси (по умолчанию 64)")
+    parser.add_argument("--frames", type=int, default=48)
+    parser.add_argument("--periods", type=float, default=1.0, help="сколько периодов самой медленной гармоники")
+    parser.add_argument("--fps", type=int, default=12)
+    parser.add_argument("--show", action="store_true", help="открыть HTML в браузере")
+    args = parser.parse_args(argv)
+
+    try:
+        states = parse_states(PRESETS.get(args.states, args.states))
+    except ValueError as e:
+        parser.error(str(e))
+    if not states:
+        parser.error("пустая суперпозиция")
+    if not any(c for c, *_ in states):
+        parser.error("все коэффициенты суперпозиции равны нулю")
+
+    profiling.configure_logging()
+    extent = max(auto_grid(n, l, m).extent for _, n, l, m in states)
+    grid = Grid(extent, args.resolution, np.float32)
+
+    with profiling.trace("animation", states=args.states, resolution=args.resolution) as trace:
+        superposition = Superposition(states, grid)
+        times = superposition.times(args.frames, args.periods)
+        start = time.perf_counter()
+        for _ in superposition.frames(times, np.empty(grid.shape, grid.dtype)):
+            pass
+        frame_ms = (time.perf_counter() - start) / len(times) * 1000
+        print(f"Базис: {len(states)} состояний, {len(superposition.omegas)} частот, "
+              f"{superposition.nbytes / 2**20:.1f} МБ; кадр {frame_ms:.2f} мс (~{1000 / max(frame_ms, 1e-6):.0f} кадров/с)")
+
+        if args.out.lower().endswith(".html"):
+            from viz.animation import animation_figure
+            fig = animation_figure(superposition, times, args.fps)
+            with profiling.span("сериализация"):
+                fig.write_html(args.out, include_plotlyjs="cdn", auto_play=False)
+            if args.show:
+                import os
+                import webbrowser
+                webbrowser.open("file://" + os.path.abspath(args.out))
+        else:
+            from viz.animation import write_video
+            write_video(args.out, superposition, times, args.fps)
+    print(f"Сохранено: {args.out} ({trace.seconds:.1f} с)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
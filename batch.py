@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core import profiling
+
+# html — изоповерхности, volume — объемный go.Volume с данными в бинарном буфере (viz.browser.write_volume_html)
+FORMATS = ("png", "html", "volume", "npy", "mesh")
+MESH_FORMATS = ("glb", "ply", "obj")
+MANIFEST = "manifest.json"
+
+
+def parse_range(text: str):
+    # "1-7", "0,2,4", "-2-2", "1-3,5" -> список целых
+    values = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        dash = part.find("-", 1)
+        if dash > 0:
+            values.extend(range(int(part[:dash]), int(part[dash + 1:]) + 1))
+        else:
+            values.append(int(part))
+    return values
+
+
+def select_orbitals(n_spec: str, l_spec: str = None, m_spec: str = None):
+    # Все допустимые (n, l, m) из заданных диапазонов; l и m по умолчанию — все разрешенные
+    orbitals = []
+    for n in parse_range(n_spec):
+        if n < 1:
+            continue
+        for l in (parse_range(l_spec) if l_spec else range(n)):
+            if not 0 <= l < n:
+                continue
+            for m in (parse_range(m_spec) if m_spec else range(-l, l + 1)):
+                if -l <= m <= l:
+                    orbitals.append((n, l, m))
+    return sorted(set(orbitals))
+
+
+def output_paths(out_dir: str, n: int, l: int, m: int, formats, mesh_format: str = "glb"):
+    base = os.path.join(out_dir, f"orbital_{n}_{l}_{m}")
+    extension = {"png": ".png", "html": ".html", "volume": ".volume.html", "npy": ".npy", "mesh": "." + mesh_format}
+    return {fmt: base + extension[fmt] for fmt in formats}
+
+
+def render_orbital(n: int, l: int, m: int, out_dir: str, formats, resolution: int, mesh_format: str = "glb",
+                   slab_workers: int = None, backend: str = None):
+    # Один элемент галереи. Выполняется в процессе пула, поэтому импорты тяжелых модулей — здесь.
+    # Каждый файл пишется во временный и переименовывается, так что существующий файл всегда полный
+    # Замер не пишется в лог рабочего процесса: времена участков уходят в результат и в лог основного.
+    # slab_workers — потоки core.parallel внутри процесса (ядра, оставшиеся на каждый процесс пула),
+    # backend — вычислительный бэкенд core.backends (по умолчанию HVIZ_BACKEND)
+    with profiling.trace("batch", log=False, n=n, l=l, m=m) as trace:
+        entry = _render(n, l, m, out_dir, formats, resolution, mesh_format, slab_workers, backend)
+    entry["timings"] = trace.as_dict()
+    return entry
+
+
+def _render(n: int, l: int, m: int, out_dir: str, formats, resolution: int, mesh_format: str,
+            slab_workers: int = None, backend: str = None):
+    import numpy as np
+    from core.autosize import auto_grid
+    from core.parallel import parallel_probability_density
+
+    start = time.perf_counter()
+    grid = auto_grid(n, l, m, voxel_budget=resolution**3)
+    paths = output_paths(out_dir, n, l, m, formats, mesh_format)
+    tmp_suffix = f".{os.getpid()}.tmp"
+
+    density = None
+    if "npy" in formats or "volume" in formats:
+        with profiling.span("плотность"):
+            density = parallel_probability_density(n, l, m, grid, slab_workers, backend=backend)
+    elif "png" in formats:
+        # Для одного PNG полная сетка не нужна: точки облака берутся из кирпичей core.sparse
+        from core.sparse import sparse_probability_density
+        with profiling.span("плотность"):
+            density = sparse_probability_density(n, l, m, grid)
+    if "npy" in formats:
+        with profiling.span("запись npy"), open(paths["npy"] + tmp_suffix, "wb") as f:
+            np.save(f, density)
+        os.replace(paths["npy"] + tmp_suffix, paths["npy"])
+    if "png" in formats:
+        from viz.plotter import create_orbital_figure_matplotlib
+        fig = create_orbital_figure_matplotlib(density, grid.x, grid.y, grid.z, n, l, m)
+        with profiling.span("savefig"):
+            fig.savefig(paths["png"] + tmp_suffix, format="png", facecolor=fig.get_facecolor())
+        os.replace(paths["png"] + tmp_suffix, paths["png"])
+    if "volume" in formats:
+        from viz.browser import write_volume_html
+        # plotly.min.js уже лежит в каталоге (run_batch), страница ссылается на общую копию
+        write_volume_html(paths["volume"] + tmp_suffix, density, grid, n, l, m, standalone=False)
+        os.replace(paths["volume"] + tmp_suffix, paths["volume"])
+
+    if "html" in formats or "mesh" in formats:
+        from viz.mesh import export_meshes, orbital_isosurfaces
+        meshes = orbital_isosurfaces(n, l, m, grid, workers=slab_workers, backend=backend)
+        if "mesh" in formats:
+            tmp = paths["mesh"] + tmp_suffix + "." + mesh_format
+            with profiling.span("запись сетки"):
+                export_meshes(tmp, meshes)
+            os.replace(tmp, paths["mesh"])
+        if "html" in formats:
+            from viz.plotter import create_isosurface_figure
+            fig = create_isosurface_figure(meshes, n, l, m)
+            with profiling.span("сериализация"):
+                html = fig.to_html(include_plotlyjs="directory")
+            with open(paths["html"] + tmp_suffix, "w", encoding="utf-8") as f:
+                f.write(html)
+            os.replace(paths["html"] + tmp_suffix, paths["html"])
+
+    return {
+        "n": n, "l": l, "m": m,
+        "extent": grid.extent, "resolution": grid.resolution,
+        "files": {fmt: os.path.basename(path) for fmt, path in paths.items()},
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def _load_manifest(out_dir: str):
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return {(e["n"], e["l"], e["m"]): e for e in json.load(f)}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def _save_manifest(out_dir: str, entries):
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump([entries[key] for key in sorted(entries)], f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def run_batch(orbitals, out_dir: str, formats=FORMATS, resolution: int = 60, mesh_format: str = "glb",
+              workers: int = None, force: bool = False, log=print, backend: str = None):
+    # Рендер списка орбиталей в пуле процессов. Уже готовые элементы (все файлы на месте, а запись в манифесте
+    # сделана с теми же параметрами) пропускаются, поэтому прерванный запуск продолжается повторным вызовом.
+    # Возвращает число неудачных элементов
+    from core.backends import DEFAULT_BACKEND
+    os.makedirs(out_dir, exist_ok=True)
+    if "html" in formats or "volume" in formats:
+        from viz.browser import ensure_plotly_js
+        ensure_plotly_js(out_dir)
+
+    manifest = _load_manifest(out_dir)
+    params = {"resolution": resolution, "backend": (backend or DEFAULT_BACKEND).lower()}
+    pending = [orbital for orbital in orbitals
+               if force or manifest.get(orbital, {}).get("params") != params
+               or not all(os.path.exists(p) for p in output_paths(out_dir, *orbital, formats, mesh_format).values())]
+    skipped = len(orbitals) - len(pending)
+    log(f"Орбиталей: {len(orbitals)}, готово ранее: {skipped}, к расчету: {len(pending)}")
+    if not pending:
+        return 0
+
+    failed = 0
+    started = time.perf_counter()
+    processes = min(workers or os.cpu_count() or 1, len(pending))
+    slab_workers = max(1, (os.cpu_count() or 1) // processes)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {pool.submit(render_orbital, *orbital, out_dir, tuple(formats), resolution, mesh_format,
+                               slab_workers, backend): orbital
+                   for orbital in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            n, l, m = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                failed += 1
+                log(f"[{done}/{len(pending)}] n={n}, l={l}, m={m}: ошибка: {e}")
+                continue
+            profiling.logger.info(json.dumps(entry.pop("timings"), ensure_ascii=False))
+            entry["params"] = params
+            manifest[(n, l, m)] = entry
+            _save_manifest(out_dir, manifest)
+            elapsed = time.perf_counter() - started
+            eta = elapsed / done * (len(pending) - done)
+            log(f"[{done}/{len(pending)}] n={n}, l={l}, m={m}: {entry['seconds']:.1f} с "
+                f"(сетка {entry['resolution']}^3, осталось ~{eta:.0f} с)")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетный рендер орбиталей водорода без интерфейса")
+    parser.add_argument("--n", default="1-3", help="главные числа: 3, 1-7, 1,2,5 (по умолчанию 1-3)")
+    parser.add_argument("--l", default=None, help="орбитальные числа (по умолчанию все допустимые)")
+    parser.add_argument("--m", default=None, help="магнитные числа (по умолчанию все допустимые)")
+    parser.add_argument("--formats", default="png,html", help=f"форматы через запятую: {', '.join(FORMATS)}")
+    parser.add_argument("--mesh-format", default="glb", choices=MESH_FORMATS)
+    parser.add_argument("--resolution", type=int, default=60, help="узлов сетки по оси (по умолчанию 60)")
+    parser.add_argument("--out", default="gallery", help="каталог результатов (по умолчанию gallery)")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию — число ядер)")
+    parser.add_argument("--force", action="store_true", help="пересчитать уже готовые элементы")
+    parser.add_argument("--backend", default=None, help="numpy, numba или auto (по умолчанию HVIZ_BACKEND)")
+    args = parser.parse_args(argv)
+
+    formats = [fmt.strip() for fmt in args.formats.split(",") if fmt.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f"неизвестные форматы: {', '.join(sorted(unknown))}")
+    orbitals = select_orbitals(args.n, args.l, args.m)
+    if not orbitals:
+        parser.error("нет допустимых (n, l, m) в заданных диапазонах")
+
+    profiling.configure_logging()
+    failed = run_batch(orbitals, args.out, formats, args.resolution, args.mesh_format, args.workers, args.force,
+                       backend=args.backend)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
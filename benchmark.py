@@ -0,0 +1,387 @@
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+from io import BytesIO
+
+import numpy as np
+
+from core.autosize import auto_grid, enclosing_radius
+from core.backends import get_backend
+from core.grid import Grid, generate_grid
+from core.physics import (angular_wavefunction, probability_density, probability_density_grid,
+                          radial_wavefunction, real_wavefunction_grid)
+
+DEFAULT_ORBITALS = [(1, 0, 0), (2, 1, 0), (3, 2, 1), (4, 3, -2), (6, 4, 2)]
+DEFAULT_RESOLUTIONS = [50, 100, 200, 300]
+DEFAULT_THRESHOLD = 0.25
+# Пары с одинаковыми l и m: их ортогональность обеспечивает только радиальная часть
+RADIAL_PAIRS = [((1, 0, 0), (2, 0, 0)), ((2, 0, 0), (3, 0, 0)), ((2, 1, 1), (4, 1, 1)), ((3, 2, -1), (5, 2, -1))]
+# Поточечные функции держат в памяти несколько массивов N^3 float64, фигуры Plotly и Matplotlib —
+# список всех точек; выше этих разрешений такие замеры пропускаются
+MAX_DENSE_RESOLUTION = 200
+MAX_FIGURE_RESOLUTION = 100
+# Эталон без scipy: R_nl и |Y_lm|^2 в замкнутом виде для нескольких орбиталей (a0 = 1)
+CLOSED_FORM_RADIAL = {
+    (1, 0): lambda r: 2 * np.exp(-r),
+    (2, 0): lambda r: (1 - r / 2) * np.exp(-r / 2) / np.sqrt(2),
+    (2, 1): lambda r: r * np.exp(-r / 2) / (2 * np.sqrt(6)),
+    (3, 2): lambda r: 4 * r**2 * np.exp(-r / 3) / (81 * np.sqrt(30)),
+}
+CLOSED_FORM_ANGULAR = {
+    (0, 0): lambda t: np.full_like(t, 1 / (4 * np.pi)),
+    (1, 0): lambda t: 3 / (4 * np.pi) * t**2,
+    (1, 1): lambda t: 3 / (8 * np.pi) * (1 - t**2),
+    (2, 0): lambda t: 5 / (16 * np.pi) * (3 * t**2 - 1)**2,
+    (2, 1): lambda t: 15 / (8 * np.pi) * t**2 * (1 - t**2),
+    (2, 2): lambda t: 15 / (32 * np.pi) * (1 - t**2)**2,
+}
+
+
+def _size(result) -> int:
+    # Размер результата в байтах: массивы, кортежи массивов, строки и байты
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    if isinstance(result, (bytes, str)):
+        return len(result)
+    if isinstance(result, (tuple, list)):
+        return sum(_size(item) for item in result)
+    return getattr(result, "nbytes", 0)
+
+
+def _bench_grid(n, l, m, grid):
+    return generate_grid(grid.extent, grid.resolution)
+
+
+def _bench_radial(n, l, m, grid):
+    return radial_wavefunction(n, l, grid.r())
+
+
+def _bench_angular(n, l, m, grid):
+    return angular_wavefunction(l, m, grid.theta(), grid.phi())
+
+
+def _bench_probability_density(n, l, m, grid):
+    return probability_density(n, l, m, grid.r(), grid.theta(), grid.phi())
+
+
+def _bench_density_grid(n, l, m, grid):
+    return probability_density_grid(n, l, m, grid)
+
+
+def _bench_real_wavefunction(n, l, m, grid):
+    return real_wavefunction_grid(n, l, m, grid)
+
+
+def _bench_parallel_density(n, l, m, grid):
+    from core.parallel import parallel_probability_density
+    return parallel_probability_density(n, l, m, grid)
+
+
+def _bench_backend_density(n, l, m, grid):
+    return get_backend().density_grid(n, l, m, grid)
+
+
+def _bench_sparse_density(n, l, m, grid):
+    from core.sparse import sparse_probability_density
+    return sparse_probability_density(n, l, m, grid)
+
+
+def _bench_plotly_figure(n, l, m, grid):
+    from viz.plotter import create_orbital_figure
+    density = probability_density_grid(n, l, m, grid)
+    return create_orbital_figure(density, grid.x, grid.y, grid.z, n, l, m).to_json()
+
+
+def _bench_volume_html(n, l, m, grid):
+    from viz.browser import volume_html
+    return volume_html(probability_density_grid(n, l, m, grid), grid, n, l, m)
+
+
+def _bench_matplotlib_figure(n, l, m, grid):
+    from viz.plotter import create_orbital_figure_matplotlib
+    density = probability_density_grid(n, l, m, grid)
+    fig = create_orbital_figure_matplotlib(density, grid.x, grid.y, grid.z, n, l, m)
+    buf = BytesIO()
+    fig.savefig(buf, format="png", facecolor=fig.get_facecolor())
+    return buf.getvalue()
+
+
+def _bench_isosurfaces(n, l, m, grid):
+    from viz.mesh import orbital_isosurfaces
+    return [array for mesh in orbital_isosurfaces(n, l, m, grid) for array in (mesh.vertices, mesh.faces)]
+
+
+# Имя замера -> (функция, наибольшее разрешение)
+BENCHMARKS = {
+    "generate_grid": (_bench_grid, MAX_DENSE_RESOLUTION),
+    "radial_wavefunction": (_bench_radial, MAX_DENSE_RESOLUTION),
+    "angular_wavefunction": (_bench_angular, MAX_DENSE_RESOLUTION),
+    "probability_density": (_bench_probability_density, MAX_DENSE_RESOLUTION),
+    "probability_density_grid": (_bench_density_grid, None),
+    "real_wavefunction_grid": (_bench_real_wavefunction, None),
+    "parallel_probability_density": (_bench_parallel_density, None),
+    "backend_density": (_bench_backend_density, None),
+    "sparse_probability_density": (_bench_sparse_density, None),
+    "create_orbital_figure": (_bench_plotly_figure, MAX_FIGURE_RESOLUTION),
+    "volume_html": (_bench_volume_html, None),
+    "create_orbital_figure_matplotlib": (_bench_matplotlib_figure, MAX_FIGURE_RESOLUTION),
+    "orbital_isosurfaces": (_bench_isosurfaces, MAX_FIGURE_RESOLUTION),
+}
+
+
+def measure(func, args, repeat: int = 3) -> dict:
+    # Время — минимум по repeat запускам без трассировки; пиковая память — отдельный запуск под tracemalloc
+    # (numpy сообщает свои выделения в tracemalloc)
+    times = []
+    result = None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    output_bytes = _size(result)
+    del result
+    gc.collect()
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": min(times), "peak_mb": peak / 2**20, "output_bytes": output_bytes}
+
+
+def _spherical_overlap(a, b, samples: int = 4000, angular: int = 48) -> complex:
+    # <psi_a|psi_b> по сферическим координатам: трапеции по r до удвоенного радиуса, охватывающего
+    # 1 - 1e-6 вероятности, Гаусс — Лежандр по cos(theta) и равномерная сетка по phi (точна для |m| < angular)
+    radius = max(enclosing_radius(a[0], a[1], 0.999999), enclosing_radius(b[0], b[1], 0.999999)) * 2
+    r = np.linspace(0, radius, samples)
+    t, w = np.polynomial.legendre.leggauss(angular)
+    phi = np.linspace(0, 2 * np.pi, 2 * angular, endpoint=False)
+    theta, phi_grid = np.meshgrid(np.arccos(t), phi, indexing="ij")
+    y_a = angular_wavefunction(a[1], a[2], theta, phi_grid)
+    y_b = angular_wavefunction(b[1], b[2], theta, phi_grid)
+    angular_part = (np.conj(y_a) * y_b * w[:, None]).sum() * (2 * np.pi / len(phi))
+    integrand = radial_wavefunction(a[0], a[1], r) * radial_wavefunction(b[0], b[1], r) * r**2
+    radial_part = ((integrand[1:] + integrand[:-1]) / 2).sum() * (r[1] - r[0])
+    return complex(radial_part * angular_part)
+
+
+def _reference_wavefunction(n: int, l: int, m: int, r, theta, phi, real: bool = False):
+    # Независимый от core.kernels эталон: psi через scipy.special (genlaguerre и сферические гармоники),
+    # real=True — вещественная гармоника без фазы Кондона — Шортли, как в core.kernels. Без scipy — None
+    try:
+        from scipy import special
+    except ImportError:
+        return None
+    rho = 2 * r / n
+    norm = np.sqrt((2 / n)**3 * math.factorial(n - l - 1) / (2 * n * math.factorial(n + l)))
+    radial = norm * np.exp(-rho / 2) * rho**l * special.genlaguerre(n - l - 1, 2 * l + 1)(rho)
+    m_abs = abs(m) if real else m
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        if hasattr(special, "sph_harm_y"):
+            harmonic = special.sph_harm_y(l, m_abs, theta, phi)
+        else:
+            harmonic = special.sph_harm(m_abs, l, phi, theta)
+    if not real:
+        return radial * harmonic
+    if m == 0:
+        return radial * harmonic.real
+    # scipy включает (-1)^m; вещественный базис ядра — без этого множителя
+    harmonic = np.sqrt(2) * (-1)**m_abs * harmonic
+    return radial * (harmonic.real if m > 0 else harmonic.imag)
+
+
+def _reference_density(n: int, l: int, m: int, r, theta, phi):
+    # |psi|^2 по scipy, без него — по замкнутым формулам CLOSED_FORM_*; None, если эталона нет
+    psi = _reference_wavefunction(n, l, m, r, theta, phi)
+    if psi is not None:
+        return np.abs(psi)**2
+    if (n, l) in CLOSED_FORM_RADIAL and (l, abs(m)) in CLOSED_FORM_ANGULAR:
+        return CLOSED_FORM_RADIAL[n, l](r)**2 * CLOSED_FORM_ANGULAR[l, abs(m)](np.cos(theta))
+    return None
+
+
+def accuracy_checks(orbitals, tolerance: float = 1e-6, grid_tolerance: float = 0.02):
+    # Нормировка и ортогональность функций ядра (сферическая квадратура), нормировка плотности на сетке
+    # и совпадение сеточного движка с независимым эталоном (scipy или замкнутые формулы), а не с
+    # поточечными функциями core.physics, которые построены на тех же ядрах. Проверка без эталона
+    # (нет scipy, а замкнутых формул для орбитали нет) записывается с полем skipped вместо passed
+    checks = []
+    for orbital in orbitals:
+        norm = _spherical_overlap(orbital, orbital).real
+        checks.append({"check": "normalization", "orbital": list(orbital), "value": norm,
+                       "error": abs(norm - 1), "passed": abs(norm - 1) < tolerance})
+
+    pairs = [(a, b) for i, a in enumerate(orbitals) for b in orbitals[i + 1:]] + RADIAL_PAIRS
+    for a, b in pairs:
+        overlap = abs(_spherical_overlap(a, b))
+        checks.append({"check": "orthogonality", "orbital": [list(a), list(b)], "value": overlap,
+                       "error": overlap, "passed": overlap < tolerance})
+
+    for n, l, m in orbitals:
+        # Куб вокруг шара с 0.9999 вероятности; сумма по узлам * dV должна быть близка к 1
+        grid = auto_grid(n, l, m, probability=0.9999, voxel_budget=161**3)
+        total = float(probability_density_grid(n, l, m, grid).sum()) * grid.step**3
+        checks.append({"check": "grid_normalization", "orbital": [n, l, m], "value": total,
+                       "error": abs(total - 1), "passed": abs(total - 1) < grid_tolerance})
+
+        grid = auto_grid(n, l, m, voxel_budget=40**3)
+        fast = probability_density_grid(n, l, m, grid)
+        reference = _reference_density(n, l, m, grid.r(), grid.theta(), grid.phi())
+        if reference is not None:
+            error = float(np.abs(fast - reference).max() / reference.max())
+            checks.append({"check": "grid_vs_reference", "orbital": [n, l, m], "value": error,
+                           "error": error, "passed": error < tolerance})
+        else:
+            checks.append({"check": "grid_vs_reference", "orbital": [n, l, m], "skipped": "no scipy"})
+
+        backend = get_backend()
+        if backend.name != "numpy":
+            error = float(np.abs(backend.density_grid(n, l, m, grid) - fast).max() / fast.max())
+            checks.append({"check": f"{backend.name}_vs_numpy", "orbital": [n, l, m], "value": error,
+                           "error": error, "passed": error < tolerance})
+
+        # Вещественный базис со знаком против R(r) * Y_lm(real) по scipy в тех же узлах
+        reference = _reference_wavefunction(n, l, m, grid.r(), grid.theta(), grid.phi(), real=True)
+        if reference is not None:
+            fast = real_wavefunction_grid(n, l, m, grid)
+            error = float(np.abs(fast - reference).max() / np.abs(reference).max())
+            checks.append({"check": "real_vs_reference", "orbital": [n, l, m], "value": error,
+                           "error": error, "passed": error < tolerance})
+        else:
+            checks.append({"check": "real_vs_reference", "orbital": [n, l, m], "skipped": "no scipy"})
+    return checks
+
+
+def run(orbitals, resolutions, names, repeat: int = 3, log=print) -> dict:
+    results = []
+    for name in names:
+        func, limit = BENCHMARKS[name]
+        for resolution in resolutions:
+            if limit is not None and resolution > limit:
+                continue
+            for n, l, m in orbitals:
+                grid = Grid(enclosing_radius(n, l), resolution)
+                entry = {"bench": name, "n": n, "l": l, "m": m, "resolution": resolution}
+                entry.update(measure(func, (n, l, m, grid), repeat))
+                results.append(entry)
+                log(f"{name:34s} n={n} l={l} m={m:+d} N={resolution:4d}  {entry['seconds'] * 1000:10.1f} мс  "
+                    f"{entry['peak_mb']:9.1f} МБ  {entry['output_bytes'] / 2**20:9.2f} МБ")
+    log("Проверки точности...")
+    checks = accuracy_checks(orbitals)
+    for check in checks:
+        if "skipped" in check:
+            log(f"{check['check']:20s} {str(check['orbital']):24s} пропущено ({check['skipped']})")
+            continue
+        log(f"{check['check']:20s} {str(check['orbital']):24s} погрешность {check['error']:.2e}  "
+            f"{'OK' if check['passed'] else 'ОШИБКА'}")
+    skipped = sum("skipped" in check for check in checks)
+    if skipped:
+        log(f"Пропущено проверок: {skipped} (независимый эталон требует scipy: pip install scipy)")
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "backend": get_backend().name,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": repeat,
+        },
+        "results": results,
+        "accuracy": checks,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD, log=print) -> int:
+    # Регрессия — рост времени или пиковой памяти больше чем в (1 + threshold) раз, либо проваленная
+    # проверка точности. Возвращает число регрессий
+    key = lambda e: (e["bench"], e["n"], e["l"], e["m"], e["resolution"])
+    old = {key(e): e for e in baseline["results"]}
+    regressions = 0
+    for entry in current["results"]:
+        previous = old.get(key(entry))
+        if previous is None:
+            continue
+        for field in ("seconds", "peak_mb"):
+            if previous[field] <= 0:
+                continue
+            ratio = entry[field] / previous[field]
+            if ratio > 1 + threshold:
+                regressions += 1
+                log(f"РЕГРЕССИЯ {field:8s} {entry['bench']} n={entry['n']} l={entry['l']} m={entry['m']} "
+                    f"N={entry['resolution']}: {previous[field]:.4g} -> {entry[field]:.4g} (x{ratio:.2f})")
+            elif ratio < 1 / (1 + threshold):
+                log(f"ускорение {field:8s} {entry['bench']} n={entry['n']} l={entry['l']} m={entry['m']} "
+                    f"N={entry['resolution']}: {previous[field]:.4g} -> {entry[field]:.4g} (x{ratio:.2f})")
+    for check in current.get("accuracy", []):
+        if not check.get("passed", True):
+            regressions += 1
+            log(f"ТОЧНОСТЬ {check['check']} {check['orbital']}: погрешность {check['error']:.2e}")
+    log(f"Регрессий: {regressions} (порог {threshold:.0%})")
+    return regressions
+
+
+def _parse_orbitals(text: str):
+    # "1,0,0;2,1,0" -> [(1, 0, 0), (2, 1, 0)]
+    return [tuple(int(v) for v in part.split(",")) for part in text.split(";") if part.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры производительности и точности расчета орбиталей")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="выполнить замеры и сохранить JSON")
+    run_parser.add_argument("--out", default="benchmark.json")
+    run_parser.add_argument("--orbitals", default=None, help="список n,l,m через ';' (по умолчанию — набор от 1s до 6g)")
+    run_parser.add_argument("--resolutions", default=None, help="через запятую (по умолчанию 50,100,200,300)")
+    run_parser.add_argument("--only", default=None, help=f"замеры через запятую: {', '.join(BENCHMARKS)}")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--quick", action="store_true", help="короткий прогон: 3 орбитали, разрешения 50 и 100")
+    run_parser.add_argument("--baseline", default=None, help="сразу сравнить с сохраненным JSON")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare_parser = sub.add_parser("compare", help="сравнить два JSON")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        return 1 if compare(baseline, current, args.threshold) else 0
+
+    orbitals = _parse_orbitals(args.orbitals) if args.orbitals else DEFAULT_ORBITALS[:3 if args.quick else None]
+    resolutions = ([int(v) for v in args.resolutions.split(",")] if args.resolutions
+                   else [50, 100] if args.quick else DEFAULT_RESOLUTIONS)
+    names = [name.strip() for name in args.only.split(",")] if args.only else list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"неизвестные замеры: {', '.join(sorted(unknown))}")
+
+    report = run(orbitals, resolutions, names, args.repeat)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"Результаты сохранены в {args.out}")
+
+    failed = sum(not check.get("passed", True) for check in report["accuracy"])
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failed += compare(json.load(f), report, args.threshold)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,25 +24,19 @@ def build():
     print("Установка зависимостей...")
     run_command(f"{python_exe} -m pip install -r requirements.txt")
 
-    import_cmd = f"{python_exe} -c \"import customtkinter; import os; print(os.path.dirname(customtkinter.__file__))\""
-    ctk_path = subprocess.check_output(import_cmd, shell=True).decode().strip()
-
-    print(f"Путь customtkinter: {ctk_path}")
-    print("Начало сборки EXE...")
+    print("Начало сборки...")
 
+    # Параметры сборки (onedir без UPX, исключения модулей) описаны в спецификации
     build_cmd = [
         pyinstaller_exe,
-        'gui_main.py',
-        '--onefile',
-        '--noconsole',
-        f'--add-data={ctk_path}{os.pathsep}customtkinter/',
-        '--name=HydrogenVisualizer',
+        'HydrogenVisualizer.spec',
+        '--noconfirm',
         '--clean'
     ]
 
     run_command(" ".join(build_cmd))
 
-    print("\nСборка завершена. Проверьте папку 'dist'.")
+    print("\nСборка завершена. Приложение — в папке 'dist/HydrogenVisualizer'.")
 
 
 if __name__ == "__main__":
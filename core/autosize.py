@@ -0,0 +1,43 @@
+import numpy as np
+
+from core import kernels
+from core.grid import Grid
+
+DEFAULT_PROBABILITY = 0.995
+DEFAULT_VOXEL_BUDGET = 50**3
+MIN_RESOLUTION = 16
+
+
+def enclosing_radius(n: int, l: int, probability: float = DEFAULT_PROBABILITY) -> float:
+    # Радиус шара, внутри которого электрон находится с вероятностью probability
+    r, _, cdf = kernels.radial_distribution(n, l)
+    return float(np.interp(probability, cdf, r))
+
+
+def feature_size(n: int, l: int, m: int, probability: float = DEFAULT_PROBABILITY,
+                 significance: float = 0.05) -> float:
+    # Наименьший масштаб заметных деталей орбитали: ширина полулепестка P(r) между соседними узлами
+    # и максимумами (полулепестки с пиком ниже significance * max P не учитываются) и ширина углового
+    # лепестка ~ pi * r / (l + 1) на наиболее вероятном радиусе
+    r, p, _ = kernels.radial_distribution(n, l)
+    radius = enclosing_radius(n, l, probability)
+    rs, ps = r[r <= radius], p[r <= radius]
+    rising = np.diff(ps) > 0
+    bounds = np.concatenate(([0], np.flatnonzero(rising[:-1] != rising[1:]) + 1))
+    widths = [rs[b] - rs[a] for a, b in zip(bounds[:-1], bounds[1:]) if ps[a:b + 1].max() >= significance * p.max()]
+    radial_feature = float(min(widths)) if widths else radius
+    angular_feature = np.pi * r[np.argmax(p)] / (l + 1) if l > 0 else radius
+    return min(radial_feature, angular_feature)
+
+
+def auto_grid(n: int, l: int, m: int, probability: float = DEFAULT_PROBABILITY,
+              voxel_budget: int = DEFAULT_VOXEL_BUDGET, samples_per_feature: float = None,
+              dtype=np.float64) -> Grid:
+    # Сетка, охватывающая заданную долю вероятности. Разрешение — максимальное в пределах voxel_budget,
+    # либо, если задано samples_per_feature, минимальное, дающее столько узлов на наименьшую деталь
+    extent = enclosing_radius(n, l, probability)
+    resolution = int(np.floor(voxel_budget ** (1 / 3) + 1e-9))
+    if samples_per_feature is not None:
+        step = feature_size(n, l, m, probability) / samples_per_feature
+        resolution = min(resolution, int(np.ceil(2 * extent / step)) + 1)
+    return Grid(extent, max(resolution, MIN_RESOLUTION), dtype)
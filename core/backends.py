@@ -0,0 +1,256 @@
+import contextlib
+import logging
+import os
+import threading
+import numpy as np
+
+from core import kernels
+from core.physics import density_block, probability_density_grid, real_wavefunction_block, real_wavefunction_grid
+
+# Вычислительный бэкенд плотности и вещественной psi: numpy (по умолчанию), numba — слитные JIT-ядра,
+# auto — numba, если установлена. Недоступный бэкенд заменяется на numpy с предупреждением в логе
+DEFAULT_BACKEND = os.environ.get("HVIZ_BACKEND", "numpy").lower()
+
+logger = logging.getLogger("hydrogen_viz")
+_lock = threading.Lock()
+_instances = {}
+
+
+class NumpyBackend:
+    # Векторные ядра core.physics: свернутый октант и таблица радиальной части по ключу k^2.
+    # Считает слой строк start:stop; параллелизм по слоям — в core.parallel, поэтому threads не используется
+    name = "numpy"
+    threaded = False
+
+    def density_grid(self, n: int, l: int, m: int, grid, start: int = 0, stop: int = None,
+                     out: np.ndarray = None, threads: int = None) -> np.ndarray:
+        return probability_density_grid(n, l, m, grid, start, stop, out)
+
+    def real_wavefunction_grid(self, n: int, l: int, m: int, grid, start: int = 0, stop: int = None,
+                               out: np.ndarray = None, threads: int = None) -> np.ndarray:
+        return real_wavefunction_grid(n, l, m, grid, start, stop, out)
+
+    def density_block(self, n: int, l: int, m: int, extent: float, resolution: int, iy, ix, iz,
+                      dtype=np.float64, out: np.ndarray = None, threads: int = None) -> np.ndarray:
+        return _store(density_block(n, l, m, extent, resolution, iy, ix, iz, dtype), out)
+
+    def real_wavefunction_block(self, n: int, l: int, m: int, extent: float, resolution: int, iy, ix, iz,
+                                dtype=np.float64, out: np.ndarray = None, threads: int = None) -> np.ndarray:
+        return _store(real_wavefunction_block(n, l, m, extent, resolution, iy, ix, iz, dtype), out)
+
+
+def _store(block: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    if out is None:
+        return block
+    out[...] = block
+    return out
+
+
+def _compile_density_kernel(numba):
+    prange = numba.prange
+
+    @numba.njit(parallel=True, cache=True)
+    def density_kernel(out, start, lin, k2, table, a, b, q0, l, m_abs):
+        # Один проход по вокселям без промежуточных массивов: R^2 / r^2l из таблицы по ключу
+        # k_x^2 + k_y^2 + k_z^2, Q_l(z, r^2) — рекурсией в регистрах, (x^2 + y^2)^|m| — на строку x.
+        # |psi|^2 четна по каждой оси: считается четверть строки (x, z >= 0), значение пишется в 4 узла,
+        # а строки y < 0, зеркальные к строкам этого же слоя, копируются вторым проходом
+        rows, resolution, _ = out.shape
+        half = resolution // 2
+        last = resolution - 1
+        for row in prange(rows):
+            iy = start + row
+            if iy < last - iy and last - iy < start + rows:
+                continue
+            y = lin[iy]
+            for ix in range(half, resolution):
+                x = lin[ix]
+                xy2 = x * x + y * y
+                power = 1.0
+                for _ in range(m_abs):
+                    power *= xy2
+                key = k2[iy] + k2[ix]
+                for iz in range(half, resolution):
+                    z = lin[iz]
+                    r2 = xy2 + z * z
+                    prev = 0.0
+                    cur = q0
+                    for j in range(l - m_abs):
+                        prev, cur = cur, a[j] * z * cur - b[j] * r2 * prev
+                    value = table[key + k2[iz]] * cur * cur * power
+                    out[row, ix, iz] = value
+                    out[row, ix, last - iz] = value
+                    out[row, last - ix, iz] = value
+                    out[row, last - ix, last - iz] = value
+        for row in prange(rows):
+            iy = start + row
+            if iy < last - iy and last - iy < start + rows:
+                out[row] = out[last - iy - start]
+
+    return density_kernel
+
+
+def _compile_block_kernel(numba):
+    prange = numba.prange
+
+    @numba.njit(parallel=True, cache=True)
+    def block_kernel(out, iy, ix, iz, lin, k2, table, a, b, q0, l, m, real):
+        # Блок на пересечении произвольных индексов (подрешетки прогрессивного расчета), без свертки октанта.
+        # real=False — |psi|^2, table = R^2 / r^2l; real=True — вещественная psi со знаком, table = R / r^l,
+        # а sqrt(2) Re/Im (x + iy)^|m| раскрывается той же рекурсией, что kernels.tesseral_cartesian
+        m_abs = abs(m)
+        for row in prange(len(iy)):
+            y = lin[iy[row]]
+            for col in range(len(ix)):
+                x = lin[ix[col]]
+                xy2 = x * x + y * y
+                factor = 1.0
+                if real:
+                    cos_part = 1.0
+                    sin_part = 0.0
+                    for _ in range(m_abs):
+                        cos_part, sin_part = cos_part * x - sin_part * y, sin_part * x + cos_part * y
+                    if m > 0:
+                        factor = 1.4142135623730951 * cos_part
+                    elif m < 0:
+                        factor = 1.4142135623730951 * sin_part
+                else:
+                    for _ in range(m_abs):
+                        factor *= xy2
+                key = k2[iy[row]] + k2[ix[col]]
+                for depth in range(len(iz)):
+                    z = lin[iz[depth]]
+                    r2 = xy2 + z * z
+                    prev = 0.0
+                    cur = q0
+                    for j in range(l - m_abs):
+                        prev, cur = cur, a[j] * z * cur - b[j] * r2 * prev
+                    value = table[key + k2[iz[depth]]] * factor
+                    out[row, col, depth] = value * cur if real else value * cur * cur
+
+    return block_kernel
+
+
+class NumbaBackend:
+    # Слитное ядро numba (parallel=True): каждый воксель считается за один проход, вся плотность
+    # пишется сразу в выходной массив. Потоками управляет numba, поэтому слои не делятся; threads ограничивает
+    # число потоков numba на время вызова (ядра, доставшиеся процессу пула batch.py)
+    name = "numba"
+    threaded = True
+
+    def __init__(self):
+        import numba
+
+        # Ядра вызываются из нескольких потоков сразу (две очереди планировщика GUI), а слой потоков
+        # workqueue при параллельных вызовах завершает процесс. Если слой не выбран явно (NUMBA_THREADING_LAYER),
+        # запрашивается потокобезопасный (tbb или omp); когда такого нет, прогрев ниже падает и get_backend
+        # переходит на numpy. Явно выбранный workqueue остается, но вызовы ядер идут по одному
+        if numba.config.THREADING_LAYER == "default":
+            numba.config.THREADING_LAYER = "threadsafe"
+        self._numba = numba
+        self._serial = threading.Lock()
+        self._kernel = _compile_density_kernel(numba)
+        self._block_kernel = _compile_block_kernel(numba)
+        # Компиляция для обоих типов результата сразу (или загрузка из кэша numba), а не на первом кадре.
+        # Подрешетки пишутся в представления с шагом — для них отдельная специализация блочного ядра
+        index = np.arange(2)
+        for dtype in (np.float64, np.float32):
+            self.density_grid(1, 0, 0, _TinyGrid(dtype))
+            self.density_block(1, 0, 0, 1.0, 2, index, index, index, dtype)
+            self.density_block(1, 0, 0, 1.0, 3, index, index, index, dtype, np.empty((4, 2, 2), dtype)[::2])
+        if numba.threading_layer() != "workqueue":
+            self._serial = contextlib.nullcontext()
+
+    def density_grid(self, n: int, l: int, m: int, grid, start: int = 0, stop: int = None,
+                     out: np.ndarray = None, threads: int = None) -> np.ndarray:
+        stop = grid.resolution if stop is None else stop
+        resolution = grid.resolution
+        if out is None:
+            out = np.empty((stop - start, resolution, resolution), dtype=grid.dtype)
+        half_step = grid.extent / (resolution - 1) if resolution > 1 else 0.0
+        k = 2 * np.arange(resolution, dtype=np.int64) - (resolution - 1)
+        k2 = k * k
+        # Таблица для всех ключей, встречающихся в слое: максимальный ключ — угол куба
+        max_key = int(k2[start:stop].max() + 2 * k2.max())
+        table = kernels.radial_envelope(n, l, half_step * np.sqrt(np.arange(max_key + 1)))**2
+        q0, a, b = kernels.angular_coefficients(l, m)
+        lin = np.linspace(-grid.extent, grid.extent, resolution)
+        with self._threads(threads):
+            self._kernel(out, start, lin, k2, table, np.array(a + (0.0,)), np.array(b + (0.0,)), q0, l, abs(m))
+        return out
+
+    def real_wavefunction_grid(self, n: int, l: int, m: int, grid, start: int = 0, stop: int = None,
+                               out: np.ndarray = None, threads: int = None) -> np.ndarray:
+        stop = grid.resolution if stop is None else stop
+        index = np.arange(grid.resolution)
+        return self.real_wavefunction_block(n, l, m, grid.extent, grid.resolution, index[start:stop], index, index,
+                                            grid.dtype, out, threads)
+
+    def density_block(self, n: int, l: int, m: int, extent: float, resolution: int, iy, ix, iz,
+                      dtype=np.float64, out: np.ndarray = None, threads: int = None) -> np.ndarray:
+        return self._block(n, l, m, extent, resolution, iy, ix, iz, dtype, out, False, threads)
+
+    def real_wavefunction_block(self, n: int, l: int, m: int, extent: float, resolution: int, iy, ix, iz,
+                                dtype=np.float64, out: np.ndarray = None, threads: int = None) -> np.ndarray:
+        return self._block(n, l, m, extent, resolution, iy, ix, iz, dtype, out, True, threads)
+
+    @contextlib.contextmanager
+    def _threads(self, threads: int = None):
+        # Число потоков numba задается отдельно для каждого вызывающего потока и после вызова возвращается
+        with self._serial:
+            previous = self._numba.get_num_threads()
+            if threads:
+                self._numba.set_num_threads(max(1, min(threads, self._numba.config.NUMBA_NUM_THREADS)))
+            try:
+                yield
+            finally:
+                self._numba.set_num_threads(previous)
+
+    def _block(self, n, l, m, extent, resolution, iy, ix, iz, dtype, out, real, threads=None):
+        iy, ix, iz = (np.asarray(index, dtype=np.int64).ravel() for index in (iy, ix, iz))
+        if out is None:
+            out = np.empty((len(iy), len(ix), len(iz)), dtype=dtype)
+        if out.size == 0:
+            return out
+        half_step = extent / (resolution - 1) if resolution > 1 else 0.0
+        k = 2 * np.arange(resolution, dtype=np.int64) - (resolution - 1)
+        k2 = k * k
+        max_key = int(k2[iy].max() + k2[ix].max() + k2[iz].max())
+        envelope = kernels.radial_envelope(n, l, half_step * np.sqrt(np.arange(max_key + 1)))
+        q0, a, b = kernels.angular_coefficients(l, m)
+        lin = np.linspace(-extent, extent, resolution)
+        with self._threads(threads):
+            self._block_kernel(out, iy, ix, iz, lin, k2, envelope if real else envelope**2,
+                               np.array(a + (0.0,)), np.array(b + (0.0,)), q0, l, m, real)
+        return out
+
+
+class _TinyGrid:
+    def __init__(self, dtype):
+        self.extent, self.resolution, self.dtype = 1.0, 2, np.dtype(dtype)
+
+
+BACKENDS = {"numpy": NumpyBackend, "numba": NumbaBackend}
+
+
+def get_backend(name: str = None):
+    # Экземпляр бэкенда по имени (по умолчанию HVIZ_BACKEND); создается один раз на процесс
+    name = (name or DEFAULT_BACKEND).lower()
+    if name != "auto" and name not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд {name!r}: доступны {', '.join(BACKENDS)} и auto")
+    with _lock:
+        if name not in _instances:
+            _instances[name] = _create(name)
+        return _instances[name]
+
+
+def _create(name: str):
+    candidates = ["numba", "numpy"] if name == "auto" else [name]
+    for candidate in candidates:
+        try:
+            return BACKENDS[candidate]()
+        except Exception as error:
+            # Нет пакета, несовместимая версия или ошибка компиляции: считаем на numpy
+            if name != "auto":
+                logger.warning(f"Бэкенд {candidate} недоступен ({error}), используется numpy")
+    return NumpyBackend()
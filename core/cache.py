@@ -0,0 +1,179 @@
+import os
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from core.grid import Grid
+from core.parallel import parallel_probability_density, parallel_real_wavefunction
+from core.profiling import count, span
+from core.sparse import BlockSparseDensity
+
+# Меняется при любом изменении формулы плотности, чтобы старые файлы не подхватывались
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = os.environ.get("HVIZ_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "hydrogen_viz")
+DEFAULT_MAX_BYTES = int(float(os.environ.get("HVIZ_CACHE_MAX_MB", 1024)) * 2**20)
+DEFAULT_MEMORY_ITEMS = 16
+
+
+class DensityCache:
+    # Двухуровневый кэш плотностей: LRU в памяти и .npy-файлы на диске, читаемые через mmap без копирования.
+    # quantity — "density" (|psi|^2) или "psi" (вещественная psi со знаком); разреженная плотность
+    # (core.sparse) хранится двумя массивами: начала кирпичей и их значения. Массивы из кэша только для чтения
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 memory_items: int = DEFAULT_MEMORY_ITEMS):
+        self.directory = os.path.join(directory, "density")
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError:
+            self.directory = None
+
+    @staticmethod
+    def key(n: int, l: int, m: int, grid: Grid, quantity: str = "density") -> str:
+        ident = (CACHE_VERSION, quantity, n, l, m, repr(grid.extent), grid.resolution, grid.dtype.str)
+        return hashlib.sha1(repr(ident).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npy")
+
+    def _remember(self, key: str, array: np.ndarray):
+        with self._lock:
+            self._memory[key] = array
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, n: int, l: int, m: int, grid: Grid, quantity: str = "density", shape=None, dtype=None):
+        # shape и dtype ожидаемого массива (по умолчанию — как у сетки); None в shape — любая длина по оси
+        shape = grid.shape if shape is None else shape
+        dtype = grid.dtype if dtype is None else np.dtype(dtype)
+        key = self.key(n, l, m, grid, quantity)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            array = np.load(path, mmap_mode="r")
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        if (array.dtype != dtype or array.ndim != len(shape)
+                or any(size is not None and actual != size for actual, size in zip(array.shape, shape))):
+            return None
+        self._remember(key, array)
+        return array
+
+    def put(self, n: int, l: int, m: int, grid: Grid, density: np.ndarray, quantity: str = "density"):
+        key = self.key(n, l, m, grid, quantity)
+        if self.directory is None:
+            self._remember(key, density)
+            return
+        # Запись во временный файл и атомарная замена: параллельные процессы не увидят недописанный файл
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, density)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._remember(key, density)
+            return
+        self.evict()
+        # В памяти держим отображение файла, а не копию: страницы живут в кэше ОС
+        try:
+            self._remember(key, np.load(self._path(key), mmap_mode="r"))
+        except OSError:
+            self._remember(key, density)
+
+    def evict(self):
+        # Удаляем давно не читанные файлы, пока кэш не уложится в max_bytes
+        if self.directory is None:
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                # Файл может быть открыт через mmap (Windows) — оставляем до следующего раза
+                continue
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.directory is None:
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def density(self, n: int, l: int, m: int, grid: Grid, compute=parallel_probability_density) -> np.ndarray:
+        return self._cached(n, l, m, grid, "density", compute)
+
+    def real_wavefunction(self, n: int, l: int, m: int, grid: Grid, compute=parallel_real_wavefunction) -> np.ndarray:
+        return self._cached(n, l, m, grid, "psi", compute)
+
+    def get_sparse(self, n: int, l: int, m: int, grid: Grid):
+        origins = self.get(n, l, m, grid, "sparse-origins", (None, 3), np.int64)
+        if origins is None:
+            return None
+        bricks = self.get(n, l, m, grid, "sparse-bricks", (len(origins), None, None, None))
+        if bricks is None:
+            return None
+        return BlockSparseDensity(grid, bricks.shape[1], origins, bricks)
+
+    def put_sparse(self, n: int, l: int, m: int, grid: Grid, sparse: BlockSparseDensity):
+        # Значения пишутся первыми: начала без значений при чтении не дают неполную плотность
+        self.put(n, l, m, grid, sparse.bricks, "sparse-bricks")
+        self.put(n, l, m, grid, sparse.origins.astype(np.int64, copy=False), "sparse-origins")
+
+    def _cached(self, n: int, l: int, m: int, grid: Grid, quantity: str, compute) -> np.ndarray:
+        with span("кэш"):
+            values = self.get(n, l, m, grid, quantity)
+        if values is None:
+            with span("плотность"):
+                values = compute(n, l, m, grid)
+            with span("запись кэша"):
+                self.put(n, l, m, grid, values, quantity)
+        count("байт плотности", values.nbytes)
+        return values
+
+
+_default_cache = None
+
+
+def default_cache() -> DensityCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = DensityCache()
+    return _default_cache
+
+
+def cached_probability_density(n: int, l: int, m: int, grid: Grid) -> np.ndarray:
+    return default_cache().density(n, l, m, grid)
+
+
+def cached_real_wavefunction(n: int, l: int, m: int, grid: Grid) -> np.ndarray:
+    return default_cache().real_wavefunction(n, l, m, grid)
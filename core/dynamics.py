@@ -0,0 +1,122 @@
+import numpy as np
+
+from core.grid import Grid
+from core.physics import wavefunction_grid
+from core.profiling import span
+
+
+def energy(n: int) -> float:
+    # Уровень энергии водорода в хартри: E_n = -1 / (2 n^2); время — в атомных единицах (hbar / E_h ~ 24.19 ас)
+    return -0.5 / n**2
+
+
+def check_quantum_numbers(n: int, l: int, m: int):
+    if n < 1 or not 0 <= l < n or abs(m) > l:
+        raise ValueError(f"Некорректные квантовые числа n={n}, l={l}, m={m}: нужно n >= 1, 0 <= l < n, |m| <= l")
+
+
+def parse_states(text: str):
+    # "1:1,0,0; 1:2,1,0" или "0.7+0.7j:2,1,1" -> [(c, n, l, m)]; коэффициент можно опустить ("2,1,0").
+    # Синтаксические ошибки и недопустимые (n, l, m) — ValueError с указанием состояния
+    states = []
+    for part in text.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        coefficient, _, numbers = part.rpartition(":")
+        try:
+            n, l, m = (int(v) for v in numbers.split(","))
+            c = complex(coefficient.replace(" ", "")) if coefficient else 1.0
+        except ValueError:
+            raise ValueError(f"Не удалось разобрать состояние {part!r}: ожидается 'c:n,l,m' или 'n,l,m'") from None
+        check_quantum_numbers(n, l, m)
+        states.append((c, n, l, m))
+    return states
+
+
+class Superposition:
+    # Нестационарное состояние psi(t) = sum c_i psi_i exp(-i E_i t) на сетке grid.
+    # Базисные функции считаются один раз (комплексные поля), а плотность раскладывается в
+    # |psi(t)|^2 = D_0 + sum_k (A_k cos w_k t + B_k sin w_k t), где w_k — различные разности энергий.
+    # Поэтому кадр — несколько умножений-сложений вещественных массивов без полиномов и гармоник;
+    # пары с одинаковой энергией (вырожденные n) сразу входят в D_0.
+    def __init__(self, states, grid: Grid):
+        self.grid = grid
+        self.states = [(complex(c), n, l, m) for c, n, l, m in states]
+        if not self.states:
+            raise ValueError("Пустая суперпозиция")
+        for _, n, l, m in self.states:
+            check_quantum_numbers(n, l, m)
+        coefficients = np.array([c for c, *_ in self.states])
+        norm = np.sqrt((np.abs(coefficients)**2).sum())
+        if norm == 0:
+            raise ValueError("Все коэффициенты суперпозиции равны нулю")
+        self.coefficients = coefficients / norm
+        self.energies = np.array([energy(n) for _, n, _, _ in self.states])
+
+        dtype = grid.dtype
+        with span("базис"):
+            basis = [c * wavefunction_grid(n, l, m, grid, complex_values=True)
+                     for c, (_, n, l, m) in zip(self.coefficients, self.states)]
+
+        with span("попарные произведения"):
+            static = np.zeros(grid.shape, dtype=dtype)
+            oscillating = {}
+            for i, psi_i in enumerate(basis):
+                static += (psi_i.real**2 + psi_i.imag**2).astype(dtype, copy=False)
+                for j in range(i + 1, len(basis)):
+                    # 2 Re(conj(a_i) a_j e^{-i (E_j - E_i) t}) для a_i = c_i psi_i
+                    product = 2 * np.conj(psi_i) * basis[j]
+                    omega = round(float(self.energies[j] - self.energies[i]), 12)
+                    if omega < 0:
+                        omega, product = -omega, np.conj(product)
+                    if omega == 0:
+                        static += product.real.astype(dtype, copy=False)
+                        continue
+                    a, b = oscillating.get(omega, (0, 0))
+                    # Re(P e^{-i w t}) = Re P cos wt + Im P sin wt
+                    oscillating[omega] = (a + product.real, b + product.imag)
+        self.static = static
+        self.omegas = np.array(sorted(oscillating), dtype=np.float64)
+        self.cosine = [oscillating[w][0].astype(dtype, copy=False) for w in self.omegas]
+        self.sine = [oscillating[w][1].astype(dtype, copy=False) for w in self.omegas]
+
+    @property
+    def period(self) -> float:
+        # Период самой медленной гармоники (для стационарного состояния — бесконечность)
+        return 2 * np.pi / self.omegas.min() if len(self.omegas) else np.inf
+
+    @property
+    def nbytes(self) -> int:
+        return self.static.nbytes + sum(a.nbytes + b.nbytes for a, b in zip(self.cosine, self.sine))
+
+    def density(self, t: float, out: np.ndarray = None) -> np.ndarray:
+        # |psi(t)|^2; out позволяет писать кадры в один и тот же буфер
+        if out is None:
+            out = self.static.copy()
+        else:
+            out[...] = self.static
+        for omega, a, b in zip(self.omegas, self.cosine, self.sine):
+            # Python float, а не np.float64: иначе кадр в float32 повышается до float64
+            cos_t, sin_t = float(np.cos(omega * t)), float(np.sin(omega * t))
+            out += cos_t * a
+            out += sin_t * b
+        return out
+
+    def peak(self) -> float:
+        # Верхняя оценка max |psi(t)|^2 по всем t: общий масштаб цвета для всех кадров
+        bound = self.static.copy()
+        for a, b in zip(self.cosine, self.sine):
+            bound += np.sqrt(a**2 + b**2)
+        return float(bound.max())
+
+    def times(self, frames: int, periods: float = 1.0) -> np.ndarray:
+        # Равномерные моменты на periods периодов самой медленной гармоники (без повтора t = T)
+        if not len(self.omegas):
+            return np.zeros(1)
+        return np.linspace(0, periods * self.period, frames, endpoint=False)
+
+    def frames(self, times, out: np.ndarray = None):
+        # Генератор (t, density); при заданном out все кадры пишутся в один буфер
+        for t in times:
+            yield t, self.density(t, out)
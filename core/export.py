@@ -0,0 +1,193 @@
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+from core.backends import get_backend
+from core.grid import Grid
+from core.profiling import count, span
+
+# Потоковая выгрузка больших объемов (512^3–1024^3) слоями постоянного размера: в памяти одновременно
+# только один слой, результат сразу уходит на диск. Форматы — по расширению пути:
+# .npy (заголовок numpy + сырые данные, читается через mmap) с описанием в соседнем .json,
+# .zarr и .h5/.hdf5 (чанки со сжатием; нужны пакеты zarr и h5py соответственно)
+FORMAT_VERSION = 1
+DEFAULT_SLAB_MB = 64
+DEFAULT_CHUNK = 64
+QUANTITIES = ("density", "psi")
+FORMATS = {".npy": "npy", ".zarr": "zarr", ".h5": "hdf5", ".hdf5": "hdf5"}
+
+
+def volume_metadata(n: int, l: int, m: int, grid: Grid, quantity: str = "density") -> dict:
+    # Все, что нужно для восстановления координат узлов без пересчета: узел [iy, ix, iz] имеет
+    # координаты origin + step * (ix, iy, iz) в боровских радиусах
+    return {
+        "format_version": FORMAT_VERSION,
+        "n": n, "l": l, "m": m,
+        "quantity": quantity,
+        "basis": "real" if quantity == "psi" else "complex",
+        "extent": grid.extent,
+        "resolution": grid.resolution,
+        "step": grid.step,
+        "origin": [-grid.extent] * 3,
+        "axes": ["y", "x", "z"],
+        "units": "bohr",
+        "dtype": grid.dtype.name,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def _format(path: str) -> str:
+    extension = os.path.splitext(path.rstrip("/\\"))[1].lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Неизвестный формат {extension!r}: поддерживаются {', '.join(FORMATS)}")
+    return FORMATS[extension]
+
+
+def _replace(tmp: str, path: str):
+    # Атомарная замена файла или каталога (zarr): читатели видят либо старый объем, либо новый целиком
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(tmp, path)
+
+
+def _remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class _NpyWriter:
+    # Слои идут по порядку, поэтому файл пишется последовательно: заголовок .npy, затем строки.
+    # В отличие от open_memmap, записанные страницы не остаются в памяти процесса
+    def __init__(self, path: str, grid: Grid, chunk: int):
+        self.path, self.tmp = path, path + ".tmp"
+        self.file = open(self.tmp, "wb")
+        np.lib.format.write_array_header_1_0(
+            self.file, {"descr": np.lib.format.dtype_to_descr(grid.dtype), "fortran_order": False, "shape": grid.shape})
+
+    def write(self, start: int, block: np.ndarray):
+        self.file.write(np.ascontiguousarray(block).data)
+
+    def close(self, metadata: dict):
+        self.file.close()
+        _replace(self.tmp, self.path)
+        with open(self.path + ".json.tmp", "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=1)
+        os.replace(self.path + ".json.tmp", self.path + ".json")
+
+    def abort(self):
+        self.file.close()
+        _remove(self.tmp)
+
+
+class _ZarrWriter:
+    def __init__(self, path: str, grid: Grid, chunk: int):
+        import zarr
+
+        self.path, self.tmp = path, path + ".tmp"
+        _remove(self.tmp)
+        # Сжатие — по умолчанию выбранной версии zarr (Blosc в 2.x, Zstd в 3.x)
+        self.array = zarr.open(self.tmp, mode="w", shape=grid.shape, chunks=(chunk,) * 3, dtype=grid.dtype)
+
+    def write(self, start: int, block: np.ndarray):
+        self.array[start:start + len(block)] = block
+
+    def close(self, metadata: dict):
+        self.array.attrs.update(metadata)
+        self.array = None
+        _replace(self.tmp, self.path)
+
+    def abort(self):
+        self.array = None
+        _remove(self.tmp)
+
+
+class _Hdf5Writer:
+    def __init__(self, path: str, grid: Grid, chunk: int):
+        import h5py
+
+        self.path, self.tmp = path, path + ".tmp"
+        self.file = h5py.File(self.tmp, "w")
+        self.dataset = self.file.create_dataset("volume", shape=grid.shape, dtype=grid.dtype, chunks=(chunk,) * 3,
+                                                compression="gzip", compression_opts=4, shuffle=True)
+
+    def write(self, start: int, block: np.ndarray):
+        self.dataset[start:start + len(block)] = block
+
+    def close(self, metadata: dict):
+        self.dataset.attrs["metadata"] = json.dumps(metadata, ensure_ascii=False)
+        self.file.close()
+        _replace(self.tmp, self.path)
+
+    def abort(self):
+        self.file.close()
+        _remove(self.tmp)
+
+
+_WRITERS = {"npy": _NpyWriter, "zarr": _ZarrWriter, "hdf5": _Hdf5Writer}
+
+
+def export_volume(path: str, n: int, l: int, m: int, grid: Grid, quantity: str = "density",
+                  slab_mb: float = DEFAULT_SLAB_MB, chunk: int = DEFAULT_CHUNK, backend: str = None,
+                  progress=None) -> dict:
+    # |psi|^2 (quantity="density") или вещественная psi со знаком ("psi") на сетке grid бэкендом core.backends,
+    # посчитанная слоями не больше slab_mb и записанная в path. Пик памяти определяется slab_mb, а не
+    # разрешением. progress(rows_done, rows_total) вызывается после каждого слоя. Возвращает метаданные
+    if quantity not in QUANTITIES:
+        raise ValueError(f"Неизвестная величина {quantity!r}: {', '.join(QUANTITIES)}")
+    fmt = _format(path)
+    chunk = max(1, min(chunk, grid.resolution))
+    rows = grid.slab_rows(int(slab_mb * 2**20))
+    if fmt != "npy":
+        # Слой из целых чанков: каждый чанк сжимается и пишется ровно один раз
+        rows = max(chunk, rows // chunk * chunk)
+    compute = get_backend(backend)
+    buffer = np.empty((min(rows, grid.resolution), grid.resolution, grid.resolution), dtype=grid.dtype)
+
+    metadata = volume_metadata(n, l, m, grid, quantity)
+    writer = _WRITERS[fmt](path, grid, chunk)
+    peak, total = 0.0, 0.0
+    try:
+        for start, stop in grid.slabs(rows):
+            out = buffer[:stop - start]
+            with span("слой"):
+                if quantity == "density":
+                    compute.density_grid(n, l, m, grid, start, stop, out=out)
+                else:
+                    compute.real_wavefunction_grid(n, l, m, grid, start, stop, out=out)
+            with span("запись слоя"):
+                writer.write(start, out)
+            peak = max(peak, float(np.abs(out).max()))
+            total += float(out.sum(dtype=np.float64) if quantity == "density" else np.square(out, dtype=np.float64).sum())
+            count("байт объема", out.nbytes)
+            if progress is not None:
+                progress(stop, grid.resolution)
+        # Вероятность внутри куба (сумма |psi|^2 dV) — быстрая проверка, что сетка охватывает орбиталь
+        metadata.update(max=peak, probability=total * grid.step**3, format=fmt,
+                        backend=compute.name)
+        with span("завершение записи"):
+            writer.close(metadata)
+    except BaseException:
+        writer.abort()
+        raise
+    return metadata
+
+
+def open_volume(path: str):
+    # (массив, метаданные) без чтения данных: np.memmap, zarr.Array или h5py.Dataset — все поддерживают
+    # срезы вида volume[100:200, :, 512], читающие с диска только нужные слои или чанки
+    fmt = _format(path)
+    if fmt == "npy":
+        with open(path + ".json", encoding="utf-8") as f:
+            metadata = json.load(f)
+        return np.load(path, mmap_mode="r"), metadata
+    if fmt == "zarr":
+        import zarr
+        array = zarr.open(path, mode="r")
+        return array, dict(array.attrs)
+    import h5py
+    dataset = h5py.File(path, "r")["volume"]
+    return dataset, json.loads(dataset.attrs["metadata"])
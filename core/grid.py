@@ -9,3 +9,71 @@ def generate_grid(extent: float, resolution: int):
         Theta[np.isnan(Theta)] = 0
     Phi = np.arctan2(Y, X)
     return X, Y, Z, R, Theta, Phi
+
+
+class Grid:
+    # Та же кубическая сетка, что generate_grid, но хранится только одномерная ось.
+    # Координаты отдаются разреженными массивами с раскладкой np.meshgrid: [y, x, z].
+    def __init__(self, extent: float, resolution: int, dtype=np.float64):
+        self.extent = float(extent)
+        self.resolution = int(resolution)
+        self.dtype = np.dtype(dtype)
+        self.lin = np.linspace(-self.extent, self.extent, self.resolution).astype(self.dtype)
+
+    @property
+    def shape(self):
+        return (self.resolution,) * 3
+
+    @property
+    def step(self) -> float:
+        return 2 * self.extent / (self.resolution - 1) if self.resolution > 1 else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        return self.resolution**3 * self.dtype.itemsize
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.lin[None, :, None]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.lin[:, None, None]
+
+    @property
+    def z(self) -> np.ndarray:
+        return self.lin[None, None, :]
+
+    def rows(self, start: int = 0, stop: int = None):
+        # Слой сетки по первой (непрерывной в памяти) оси: разреженные x, y, z этого слоя
+        stop = self.resolution if stop is None else stop
+        return self.x, self.y[start:stop], self.z
+
+    def r(self, start: int = 0, stop: int = None) -> np.ndarray:
+        x, y, z = self.rows(start, stop)
+        return np.sqrt(x**2 + y**2 + z**2)
+
+    def theta(self, start: int = 0, stop: int = None) -> np.ndarray:
+        x, y, z = self.rows(start, stop)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            theta = np.arccos(z / self.r(start, stop))
+        theta[np.isnan(theta)] = 0
+        return theta
+
+    def phi(self, start: int = 0, stop: int = None) -> np.ndarray:
+        x, y, _ = self.rows(start, stop)
+        return np.broadcast_to(np.arctan2(y, x), (len(y), self.resolution, self.resolution))
+
+    def dense(self):
+        # Полные X, Y, Z как представления только для чтения, без копирования
+        return tuple(np.broadcast_to(c, self.shape) for c in (self.x, self.y, self.z))
+
+    def slab_rows(self, max_bytes: int) -> int:
+        return max(1, min(self.resolution, max_bytes // (self.resolution**2 * self.dtype.itemsize)))
+
+    def slabs(self, rows: int = None, max_bytes: int = None):
+        # Границы слоев (start, stop), каждый не больше rows строк или max_bytes байт
+        if rows is None:
+            rows = self.slab_rows(max_bytes) if max_bytes else self.resolution
+        for start in range(0, self.resolution, rows):
+            yield start, min(start + rows, self.resolution)
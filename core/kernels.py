@@ -0,0 +1,151 @@
+import numpy as np
+from functools import lru_cache
+from math import lgamma, log, pi, exp
+
+# Ядра водородных функций без scipy.special: нормировки считаются через lgamma (без переполнения
+# факториалов при больших n), полиномы — устойчивыми трехчленными рекуррентными соотношениями.
+# Коэффициенты рекурсий запоминаются для каждой пары (n, l) и (l, |m|).
+
+
+@lru_cache(maxsize=None)
+def radial_coefficients(n: int, l: int, a0: float = 1.0):
+    # log нормировки R_nl и коэффициенты рекурсии для L_{n-l-1}^{(2l+1)}:
+    # L_{k+1} = (A_k - B_k * rho) * L_k - C_k * L_{k-1}
+    alpha = 2 * l + 1
+    log_norm = 0.5 * (3 * log(2 / (n * a0)) + lgamma(n - l) - log(2 * n) - lgamma(n + l + 1))
+    k = np.arange(1, max(n - l - 1, 1), dtype=np.float64)
+    # Кортежи python float: не продвигают float32-массивы до float64 и не изменяются извне
+    return (log_norm, tuple(((2 * k + 1 + alpha) / (k + 1)).tolist()), tuple((1 / (k + 1)).tolist()),
+            tuple(((k + alpha) / (k + 1)).tolist()))
+
+
+@lru_cache(maxsize=None)
+def angular_coefficients(l: int, m: int):
+    # Нормированные Q_j = N_jm * r^(j-|m|) * d^|m| P_j / dt^|m| (t = z / r), j = |m|..l:
+    # Q_{j+1} = a_j * z * Q_j - b_j * r^2 * Q_{j-1}
+    m = abs(m)
+    start = exp(0.5 * log((2 * m + 1) / (4 * pi)) + 0.5 * lgamma(2 * m + 1) - m * log(2) - lgamma(m + 1))
+    j = np.arange(m, l, dtype=np.float64)
+    ratio = np.sqrt((2 * j + 3) / (2 * j + 1) * (j + 1 - m) / (j + 1 + m))
+    ratio_prev = np.concatenate(([0.0], ratio[:-1]))
+    a = (2 * j + 1) / (j - m + 1) * ratio
+    b = (j + m) / (j - m + 1) * ratio * ratio_prev
+    return start, tuple(a.tolist()), tuple(b.tolist())
+
+
+def _float_array(x) -> np.ndarray:
+    x = np.asarray(x)
+    return x if np.issubdtype(x.dtype, np.floating) else x.astype(np.float64)
+
+
+def laguerre(n: int, l: int, rho: np.ndarray, log_scale=None) -> np.ndarray:
+    # L_{n-l-1}^{(2l+1)}(rho). С log_scale возвращает exp(log_scale) * L: множитель делится поровну
+    # между шагами рекурсии, поэтому промежуточные значения не переполняют float32 даже при n ~ 30
+    rho = _float_array(rho)
+    _, A, B, C = radial_coefficients(n, l)
+    degree = n - l - 1
+    if log_scale is None:
+        step = 1.0
+    elif degree == 0:
+        return np.exp(log_scale) * np.ones_like(rho)
+    else:
+        step = np.exp(log_scale / degree)
+    prev = np.ones_like(rho)
+    if degree == 0:
+        return prev
+    cur = ((2 * l + 2) - rho) * step
+    step2 = step * step
+    for k in range(degree - 1):
+        prev, cur = cur, (A[k] - B[k] * rho) * step * cur - C[k] * step2 * prev
+    return cur
+
+
+def radial(n: int, l: int, r: np.ndarray, a0: float = 1.0) -> np.ndarray:
+    # R_nl(r); множитель norm * rho^l * exp(-rho/2) собирается в показателе экспоненты
+    r = _float_array(r)
+    rho = 2 * r / (n * a0)
+    exponent = radial_coefficients(n, l, a0)[0] - rho / 2
+    if l > 0:
+        with np.errstate(divide='ignore'):
+            exponent = exponent + l * np.log(rho)
+    return laguerre(n, l, rho, exponent)
+
+
+def radial_envelope(n: int, l: int, r: np.ndarray, a0: float = 1.0) -> np.ndarray:
+    # R_nl(r) / r^l — гладкая часть радиальной функции, конечная в нуле
+    r = _float_array(r)
+    rho = 2 * r / (n * a0)
+    log_norm = radial_coefficients(n, l, a0)[0] + l * log(2 / (n * a0))
+    return laguerre(n, l, rho, log_norm - rho / 2)
+
+
+def legendre_cartesian(l: int, m: int, z: np.ndarray, r2: np.ndarray) -> np.ndarray:
+    # Нормированный многочлен Q_l(z, r^2): |r^l * Y_lm|^2 = (x^2 + y^2)^|m| * Q_l^2.
+    # При l - |m| <= 1 результат зависит только от z.
+    z = _float_array(z)
+    start, a, b = angular_coefficients(l, m)
+    prev = None
+    cur = np.full_like(z, start)
+    for j in range(l - abs(m)):
+        nxt = a[j] * z * cur
+        if prev is not None:
+            nxt = nxt - b[j] * r2 * prev
+        prev, cur = cur, nxt
+    return cur
+
+
+def spherical_harmonic(l: int, m: int, theta: np.ndarray, phi: np.ndarray) -> np.ndarray:
+    # Комплексная Y_lm с фазой Кондона — Шортли (та же конвенция, что scipy.special.sph_harm)
+    theta = _float_array(theta)
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    magnitude = legendre_cartesian(l, m, cos_t, 1.0) * sin_t**abs(m)
+    if m > 0 and m % 2:
+        magnitude = -magnitude
+    return magnitude * np.exp(1j * m * _float_array(phi))
+
+
+def tesseral_cartesian(m: int, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    # sqrt(2) * Re (x + iy)^m при m > 0, sqrt(2) * Im (x + iy)^|m| при m < 0, 1 при m = 0.
+    # (x + iy)^k раскрывается вещественной рекурсией по (C_k, S_k): комплексные массивы не создаются
+    x, y = _float_array(x), _float_array(y)
+    if m == 0:
+        return np.ones(np.broadcast_shapes(x.shape, y.shape), dtype=np.result_type(x, y))
+    cos_part, sin_part = x, y
+    for _ in range(abs(m) - 1):
+        cos_part, sin_part = cos_part * x - sin_part * y, sin_part * x + cos_part * y
+    return np.sqrt(2.0) * (cos_part if m > 0 else sin_part)
+
+
+def real_spherical_harmonic(l: int, m: int, theta: np.ndarray, phi: np.ndarray) -> np.ndarray:
+    # Вещественная (тессеральная) Y_lm, как в химии: m > 0 — cos(m phi), m < 0 — sin(|m| phi),
+    # без фазы Кондона — Шортли, так что p_x (l=1, m=1) положительна вдоль +x, а d_xy (l=2, m=-2) — при x, y > 0
+    theta, phi = _float_array(theta), _float_array(phi)
+    sin_t = np.sin(theta)
+    magnitude = legendre_cartesian(l, m, np.cos(theta), 1.0) * sin_t**abs(m)
+    if m == 0:
+        return magnitude
+    return magnitude * np.sqrt(2.0) * (np.cos(m * phi) if m > 0 else np.sin(-m * phi))
+
+
+def angular_density(l: int, m: int, theta: np.ndarray) -> np.ndarray:
+    # |Y_lm|^2 — от phi не зависит, комплексные массивы не нужны
+    theta = _float_array(theta)
+    return (legendre_cartesian(l, m, np.cos(theta), 1.0) * np.sin(theta)**abs(m))**2
+
+
+@lru_cache(maxsize=None)
+def radial_distribution(n: int, l: int, samples: int = 20001):
+    # P(r) = r^2 R_nl^2 и ее функция распределения на отрезке, заведомо покрывающем хвост
+    r = np.linspace(0.0, 4.0 * n**2 + 10.0 * n + 10.0, samples)
+    p = r**2 * radial(n, l, r)**2
+    cdf = np.concatenate(([0.0], np.cumsum((p[1:] + p[:-1]) / 2 * np.diff(r))))
+    return r, p, cdf / cdf[-1]
+
+
+@lru_cache(maxsize=None)
+def polar_distribution(l: int, m: int, samples: int = 8193):
+    # |Y_lm|^2 как плотность по t = cos(theta) (dOmega = dt dphi) и ее функция распределения
+    t = np.linspace(-1.0, 1.0, samples)
+    p = legendre_cartesian(l, m, t, 1.0)**2 * (1 - t**2)**abs(m)
+    cdf = np.concatenate(([0.0], np.cumsum((p[1:] + p[:-1]) / 2 * np.diff(t))))
+    return t, p, cdf / cdf[-1]
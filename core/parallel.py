@@ -0,0 +1,164 @@
+import os
+import atexit
+import multiprocessing
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from core.backends import get_backend
+from core.grid import Grid
+from core.physics import density_block, probability_density_grid, real_wavefunction_block, real_wavefunction_grid
+
+# Число потоков/процессов и высота слоя переопределяются через окружение
+DEFAULT_WORKERS = int(os.environ.get("HVIZ_WORKERS", 0)) or os.cpu_count() or 1
+DEFAULT_CHUNK_ROWS = int(os.environ.get("HVIZ_CHUNK_ROWS", 0)) or None
+DEFAULT_EXECUTOR = os.environ.get("HVIZ_EXECUTOR", "thread")
+
+_pools = {}
+# Пулы запрашиваются из нескольких потоков сразу (две очереди планировщика GUI): без блокировки каждый
+# мог бы создать свой исполнитель для одного ключа, а лишний так и остался бы незакрытым
+_pools_lock = threading.Lock()
+
+
+def _get_pool(kind: str, workers: int):
+    key = (kind, workers)
+    with _pools_lock:
+        if key not in _pools:
+            if kind == "process":
+                # Пул может создаваться из рабочего потока GUI: fork многопоточного процесса с окном Tk
+                # может зависнуть, поэтому процессы запускаются через spawn
+                _pools[key] = ProcessPoolExecutor(max_workers=workers,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+            else:
+                _pools[key] = ThreadPoolExecutor(max_workers=workers)
+        return _pools[key]
+
+
+@atexit.register
+def shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _half_slabs(resolution: int, workers: int, chunk_rows: int = None):
+    # Плотность симметрична относительно y -> -y, поэтому считаются только строки y >= 0,
+    # а зеркальные строки заполняются копией. Слоев в ~4 раза больше, чем исполнителей, для балансировки.
+    first = resolution // 2
+    half = resolution - first
+    rows = chunk_rows or max(1, -(-half // (workers * 4)))
+    return [(start, min(start + rows, resolution)) for start in range(first, resolution, rows)]
+
+
+def _even_slabs(rows: int, workers: int, chunk_rows: int = None):
+    rows_per_slab = chunk_rows or max(1, -(-rows // (workers * 4)))
+    return [(start, min(start + rows_per_slab, rows)) for start in range(0, rows, rows_per_slab)]
+
+
+def _fill_rows(out, start, stop, n, l, m, grid):
+    resolution = grid.resolution
+    block = probability_density_grid(n, l, m, grid, start, stop)
+    out[start:stop] = block
+    out[resolution - stop:resolution - start] = block[::-1]
+
+
+def _fill_real_rows(out, start, stop, n, l, m, grid):
+    # Вещественная psi при y -> -y меняет знак только для m < 0 (sin |m| phi)
+    resolution = grid.resolution
+    block = real_wavefunction_grid(n, l, m, grid, start, stop)
+    out[start:stop] = block
+    out[resolution - stop:resolution - start] = -block[::-1] if m < 0 else block[::-1]
+
+
+def _fill_block_rows(out, start, stop, block, n, l, m, extent, resolution, iy, ix, iz, dtype):
+    out[start:stop] = block(n, l, m, extent, resolution, iy[start:stop], ix, iz, dtype)
+
+
+def _fill_shared(shm_name, shape, dtype, fill, args, start, stop):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        fill(out, start, stop, *args)
+        del out
+    finally:
+        shm.close()
+
+
+def _run_slabs(fill, args, shape, dtype, slabs, workers: int, executor: str, out: np.ndarray = None) -> np.ndarray:
+    # fill(out, start, stop, *args) для каждого слоя: в пуле потоков — прямо в out, в пуле процессов —
+    # в общую память, которая копируется в out один раз. fill и args должны передаваться в процесс (pickle)
+    dtype = np.dtype(dtype)
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    if workers == 1 or len(slabs) == 1:
+        for start, stop in slabs:
+            fill(out, start, stop, *args)
+        return out
+
+    pool = _get_pool(executor, workers)
+    if executor != "process":
+        futures = [pool.submit(fill, out, start, stop, *args) for start, stop in slabs]
+        for future in futures:
+            future.result()
+        return out
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+    try:
+        futures = [pool.submit(_fill_shared, shm.name, shape, dtype.str, fill, args, start, stop)
+                   for start, stop in slabs]
+        for future in futures:
+            future.result()
+        shared = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        out[...] = shared
+        del shared
+    finally:
+        shm.close()
+        shm.unlink()
+    return out
+
+
+def parallel_probability_density(n: int, l: int, m: int, grid: Grid, workers: int = None,
+                                 chunk_rows: int = None, executor: str = None, backend: str = None) -> np.ndarray:
+    # |psi|^2 на сетке, посчитанная слоями в пуле потоков ("thread") или процессов ("process").
+    # Все слои пишутся в один заранее выделенный массив; кубы между процессами не передаются.
+    # backend — core.backends (по умолчанию HVIZ_BACKEND); JIT-бэкенд распараллеливает расчет сам, но не
+    # больше чем на workers потоков
+    compute = get_backend(backend)
+    workers = workers or DEFAULT_WORKERS
+    if compute.threaded:
+        return compute.density_grid(n, l, m, grid, threads=workers)
+    slabs = _half_slabs(grid.resolution, workers, chunk_rows or DEFAULT_CHUNK_ROWS)
+    return _run_slabs(_fill_rows, (n, l, m, grid), grid.shape, grid.dtype, slabs, workers,
+                      executor or DEFAULT_EXECUTOR)
+
+
+def parallel_real_wavefunction(n: int, l: int, m: int, grid: Grid, workers: int = None,
+                               chunk_rows: int = None, executor: str = None, backend: str = None) -> np.ndarray:
+    # Вещественная psi со знаком (core.physics.real_wavefunction_grid) теми же слоями
+    compute = get_backend(backend)
+    workers = workers or DEFAULT_WORKERS
+    if compute.threaded:
+        return compute.real_wavefunction_grid(n, l, m, grid, threads=workers)
+    slabs = _half_slabs(grid.resolution, workers, chunk_rows or DEFAULT_CHUNK_ROWS)
+    return _run_slabs(_fill_real_rows, (n, l, m, grid), grid.shape, grid.dtype, slabs, workers,
+                      executor or DEFAULT_EXECUTOR)
+
+
+def parallel_block(n: int, l: int, m: int, extent: float, resolution: int, iy, ix, iz, dtype=np.float64,
+                   real: bool = False, workers: int = None, executor: str = None, out: np.ndarray = None,
+                   backend: str = None) -> np.ndarray:
+    # core.physics.density_block (или real_wavefunction_block при real=True) на пересечении индексов,
+    # разбитое по iy на слои. out может быть представлением с шагом, например подрешеткой [1::2, ::2, 1::2]
+    iy, ix, iz = (np.asarray(index) for index in (iy, ix, iz))
+    compute = get_backend(backend)
+    workers = workers or DEFAULT_WORKERS
+    if compute.threaded:
+        block = compute.real_wavefunction_block if real else compute.density_block
+        return block(n, l, m, extent, resolution, iy, ix, iz, dtype, out, workers)
+    block = real_wavefunction_block if real else density_block
+    slabs = _even_slabs(len(iy), workers, DEFAULT_CHUNK_ROWS)
+    return _run_slabs(_fill_block_rows, (block, n, l, m, extent, resolution, iy, ix, iz, dtype),
+                      (len(iy), len(ix), len(iz)), dtype, slabs, workers, executor or DEFAULT_EXECUTOR, out)
@@ -1,19 +1,185 @@
 import numpy as np
-from scipy.special import sph_harm, genlaguerre, factorial
+from core import kernels
 
 def radial_wavefunction(n: int, l: int, r: np.ndarray, a0: float = 1.0) -> np.ndarray:
-    rho = 2 * r / (n * a0)
-    prefactor = np.sqrt(
-        (2 / (n * a0))**3 * factorial(n - l - 1) / (2 * n * factorial(n + l))
-    )
-    laguerre_poly = genlaguerre(n - l - 1, 2 * l + 1)(rho)
-    return prefactor * np.exp(-rho / 2) * (rho ** l) * laguerre_poly
+    return kernels.radial(n, l, r, a0)
 
 def angular_wavefunction(l: int, m: int, theta: np.ndarray, phi: np.ndarray) -> np.ndarray:
-    return sph_harm(m, l, phi, theta)
+    return kernels.spherical_harmonic(l, m, theta, phi)
+
+def real_angular_wavefunction(l: int, m: int, theta: np.ndarray, phi: np.ndarray) -> np.ndarray:
+    # Вещественная гармоника (p_x, p_y, d_xy, ...): вещественный массив вместо комплексного
+    return kernels.real_spherical_harmonic(l, m, theta, phi)
 
 def probability_density(n: int, l: int, m: int, r: np.ndarray, theta: np.ndarray, phi: np.ndarray) -> np.ndarray:
-    R = radial_wavefunction(n, l, r)
-    Y = angular_wavefunction(l, m, theta, phi)
-    psi = R * Y
-    return np.abs(psi)**2
+    # |Y_lm|^2 не зависит от phi, поэтому комплексное произведение R * Y не строится
+    return radial_wavefunction(n, l, r)**2 * kernels.angular_density(l, m, theta)
+
+
+def wavefunction_at_points(n: int, l: int, m: int, x: np.ndarray, y: np.ndarray, z: np.ndarray,
+                           real: bool = False) -> np.ndarray:
+    # psi в произвольных точках в декартовой форме, без theta и phi: вещественный базис (real=True)
+    # или Re psi со знаком, как у wavefunction_at_indices. Re (x + iy)^|m| = tesseral_cartesian / sqrt(2)
+    r2 = x**2 + y**2 + z**2
+    psi = kernels.radial_envelope(n, l, np.sqrt(r2)) * kernels.legendre_cartesian(l, m, z, r2)
+    if m == 0:
+        return psi
+    if real:
+        return psi * kernels.tesseral_cartesian(m, x, y)
+    psi = psi * kernels.tesseral_cartesian(abs(m), x, y) / np.sqrt(2.0)
+    return -psi if m > 0 and m % 2 else psi
+
+def density_at_points(n: int, l: int, m: int, x: np.ndarray, y: np.ndarray, z: np.ndarray,
+                      real: bool = False) -> np.ndarray:
+    # |psi|^2 в произвольных точках; для комплексной psi множитель |(x + iy)^m|^2 = (x^2 + y^2)^|m|
+    if real:
+        return wavefunction_at_points(n, l, m, x, y, z, real=True)**2
+    r2 = x**2 + y**2 + z**2
+    density = (kernels.radial_envelope(n, l, np.sqrt(r2)) * kernels.legendre_cartesian(l, m, z, r2))**2
+    if m != 0:
+        density *= (x**2 + y**2)**abs(m)
+    return density
+
+def probability_density_grid(n: int, l: int, m: int, grid, start: int = 0, stop: int = None,
+                             out: np.ndarray = None) -> np.ndarray:
+    # |psi|^2 на сетке Grid (или на ее слое строк start:stop) без кубов R, Theta, Phi
+    stop = grid.resolution if stop is None else stop
+    index = np.arange(grid.resolution)
+    block = density_block(n, l, m, grid.extent, grid.resolution, index[start:stop], index, index, grid.dtype)
+    if out is None:
+        return block
+    out[...] = block
+    return out
+
+def _fold(index: np.ndarray, resolution: int):
+    # |psi|^2 зависит только от x^2, y^2, z^2: узлы i и N-1-i симметричной сетки дают одно значение
+    folded = np.maximum(index, resolution - 1 - index)
+    unique, inverse = np.unique(folded, return_inverse=True)
+    return unique, inverse
+
+def density_block(n: int, l: int, m: int, extent: float, resolution: int,
+                  iy: np.ndarray, ix: np.ndarray, iz: np.ndarray, dtype=np.float64) -> np.ndarray:
+    # Блок сетки generate_grid(extent, resolution) на пересечении индексов iy, ix, iz (раскладка [y, x, z])
+    uy, inv_y = _fold(np.asarray(iy), resolution)
+    ux, inv_x = _fold(np.asarray(ix), resolution)
+    uz, inv_z = _fold(np.asarray(iz), resolution)
+    density = density_at_indices(n, l, m, extent, resolution, uy[:, None, None], ux[None, :, None], uz[None, None, :])
+
+    # Счет ведется в float64 (множители r^2l и R/r^l выходят за диапазон float32 при больших n),
+    # в целевой тип приводится только свернутый октант
+    density = density.astype(dtype, copy=False)
+    if all(np.array_equal(inv, np.arange(len(inv))) for inv in (inv_y, inv_x, inv_z)):
+        return density
+    return density[np.ix_(inv_y, inv_x, inv_z)]
+
+def density_at_indices(n: int, l: int, m: int, extent: float, resolution: int,
+                       iy: np.ndarray, ix: np.ndarray, iz: np.ndarray) -> np.ndarray:
+    # |psi|^2 в узлах сетки с индексами iy, ix, iz (взаимно транслируемые массивы).
+    # |psi|^2 = [R(r) / r^l]^2 * |r^l * Y_lm|^2, а второй множитель — многочлен от x^2 + y^2, z и r^2
+    lin = np.linspace(-extent, extent, resolution)
+    density = _radial_at_indices(n, l, extent, resolution, iy, ix, iz, squared=True)
+
+    xy2 = lin[iy]**2 + lin[ix]**2
+    z = lin[iz]
+    if l - abs(m) <= 1:
+        density *= kernels.legendre_cartesian(l, m, z, None)**2
+    else:
+        r2 = xy2 + z**2
+        density *= kernels.legendre_cartesian(l, m, z, r2)**2
+        del r2
+    if m != 0:
+        density *= xy2**abs(m)
+    return density
+
+def _radial_at_indices(n: int, l: int, extent: float, resolution: int,
+                       iy: np.ndarray, ix: np.ndarray, iz: np.ndarray, squared: bool) -> np.ndarray:
+    # Узел i имеет координату k_i * half_step, поэтому r^2 = half_step^2 * (k_x^2 + k_y^2 + k_z^2):
+    # R(r) / r^l считается один раз на каждый различный радиус и раздается по целочисленному ключу
+    half_step = extent / (resolution - 1) if resolution > 1 else 0.0
+    k = 2 * np.arange(resolution, dtype=np.int32) - (resolution - 1)
+    k2 = k * k
+    keys = k2[iy] + k2[ix]
+    keys = keys + k2[iz]
+    radii = half_step * np.sqrt(np.arange(int(keys.max()) + 1))
+    radial = kernels.radial_envelope(n, l, radii)
+    return (radial**2 if squared else radial)[keys]
+
+def wavefunction_at_indices(n: int, l: int, m: int, extent: float, resolution: int,
+                            iy: np.ndarray, ix: np.ndarray, iz: np.ndarray, complex_values: bool = False) -> np.ndarray:
+    # Re psi со знаком (фаза Кондона — Шортли, как у angular_wavefunction):
+    # r^l * Y_lm = Q_l(z, r^2) * (x + iy)^m, а Re (x + iy)^|m| = r_xy^|m| cos(|m| phi).
+    # complex_values=True — полная комплексная psi, для m < 0 множитель (x - iy)^|m|
+    lin = np.linspace(-extent, extent, resolution)
+    psi = _radial_at_indices(n, l, extent, resolution, iy, ix, iz, squared=False)
+
+    x, y, z = lin[ix], lin[iy], lin[iz]
+    if l - abs(m) <= 1:
+        psi = psi * kernels.legendre_cartesian(l, m, z, None)
+    else:
+        psi = psi * kernels.legendre_cartesian(l, m, z, x**2 + y**2 + z**2)
+    if complex_values:
+        psi = psi * (x + 1j * np.sign(m) * y)**abs(m) if m != 0 else psi.astype(np.complex128)
+    elif m != 0:
+        psi *= ((x + 1j * y)**abs(m)).real
+    if m > 0 and m % 2:
+        psi = -psi
+    return psi
+
+def wavefunction_grid(n: int, l: int, m: int, grid, complex_values: bool = False) -> np.ndarray:
+    index = np.arange(grid.resolution)
+    psi = wavefunction_at_indices(n, l, m, grid.extent, grid.resolution,
+                                  index[:, None, None], index[None, :, None], index[None, None, :], complex_values)
+    if complex_values:
+        return psi.astype(np.result_type(grid.dtype, np.complex64), copy=False)
+    return psi.astype(grid.dtype, copy=False)
+
+def _real_parities(l: int, m: int):
+    # Четности вещественной psi по осям [y, x, z]: psi(-y) = (-1)^p_y psi(y) и т. д.
+    # Re (x + iy)^m содержит только четные степени y, Im — только нечетные
+    m_abs = abs(m)
+    return (0 if m >= 0 else 1), (m_abs if m >= 0 else m_abs - 1) % 2, (l - m_abs) % 2
+
+def real_wavefunction_at_indices(n: int, l: int, m: int, extent: float, resolution: int,
+                                 iy: np.ndarray, ix: np.ndarray, iz: np.ndarray) -> np.ndarray:
+    # Вещественная psi = R(r) * Y_lm(real) = [R / r^l] * Q_l(z, r^2) * sqrt(2) Re/Im (x + iy)^|m|, в float64
+    lin = np.linspace(-extent, extent, resolution)
+    psi = _radial_at_indices(n, l, extent, resolution, iy, ix, iz, squared=False)
+
+    x, y, z = lin[ix], lin[iy], lin[iz]
+    if l - abs(m) <= 1:
+        psi *= kernels.legendre_cartesian(l, m, z, None)
+    else:
+        psi *= kernels.legendre_cartesian(l, m, z, x**2 + y**2 + z**2)
+    if m != 0:
+        psi *= kernels.tesseral_cartesian(m, x, y)
+    return psi
+
+def real_wavefunction_block(n: int, l: int, m: int, extent: float, resolution: int,
+                            iy: np.ndarray, ix: np.ndarray, iz: np.ndarray, dtype=np.float64) -> np.ndarray:
+    # Как density_block, но со знаком: считается свернутый октант, а отраженные узлы получают
+    # множитель -1 по каждой оси с нечетной четностью
+    folded = [_fold(np.asarray(index), resolution) for index in (iy, ix, iz)]
+    (uy, inv_y), (ux, inv_x), (uz, inv_z) = folded
+    psi = real_wavefunction_at_indices(n, l, m, extent, resolution, uy[:, None, None], ux[None, :, None], uz[None, None, :])
+    psi = psi.astype(dtype, copy=False)
+    if not all(np.array_equal(inv, np.arange(len(inv))) for _, inv in folded):
+        psi = psi[np.ix_(inv_y, inv_x, inv_z)]
+    for axis, (index, parity) in enumerate(zip((iy, ix, iz), _real_parities(l, m))):
+        index = np.asarray(index).ravel()
+        if parity and np.any(2 * index < resolution - 1):
+            shape = [1, 1, 1]
+            shape[axis] = len(index)
+            psi *= np.where(2 * index < resolution - 1, -1, 1).astype(psi.dtype).reshape(shape)
+    return psi
+
+def real_wavefunction_grid(n: int, l: int, m: int, grid, start: int = 0, stop: int = None,
+                           out: np.ndarray = None) -> np.ndarray:
+    # Вещественная psi сразу в grid.dtype (float32 вдвое легче complex64 и вчетверо — complex128);
+    # плотность этой орбитали — psi**2
+    stop = grid.resolution if stop is None else stop
+    index = np.arange(grid.resolution)
+    block = real_wavefunction_block(n, l, m, grid.extent, grid.resolution, index[start:stop], index, index, grid.dtype)
+    if out is None:
+        return block
+    out[...] = block
+    return out
@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# HVIZ_PROFILE: пусто — только таймеры участков (почти бесплатно), memory — еще и пик памяти каждого
+# участка через tracemalloc, cprofile — профиль cProfile всего замера, all — оба режима
+PROFILE_MODE = os.environ.get("HVIZ_PROFILE", "").lower()
+PROFILE_DIR = os.environ.get("HVIZ_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "hydrogen_viz", "profiles")
+
+logger = logging.getLogger("hydrogen_viz")
+_local = threading.local()
+
+
+class Trace:
+    # Один замер конвейера: последовательность участков (имя, секунды, пик памяти в байтах или None)
+    # и счетчики объемов данных. Объект можно передать в другой поток и продолжить через activate()
+    def __init__(self, name: str, **fields):
+        self.name = name
+        self.fields = fields
+        self.spans = []
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.profile_path = None
+
+    def add(self, name: str, seconds: float, peak_bytes: int = None):
+        self.spans.append((name, seconds, peak_bytes))
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def totals(self):
+        # Время по участкам с суммированием повторов, в порядке первого появления
+        totals = {}
+        for name, seconds, _ in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds
+        return totals
+
+    def summary(self, limit: int = 4) -> str:
+        # Краткая строка для статуса: самые долгие участки, "плотность 40 мс · scatter 85 мс"
+        totals = sorted(self.totals().items(), key=lambda item: -item[1])[:limit]
+        return " · ".join(f"{name} {seconds * 1000:.0f} мс" for name, seconds in totals)
+
+    def finish(self, log: bool = True):
+        # Фиксирует полное время (от создания, включая ожидание между потоками) и пишет запись в лог
+        self.seconds = time.perf_counter() - self.started
+        if log:
+            logger.info(json.dumps(self.as_dict(), ensure_ascii=False))
+        return self
+
+    def as_dict(self) -> dict:
+        spans = {}
+        for name, seconds, peak in self.spans:
+            entry = spans.setdefault(name, {"ms": 0.0, "calls": 0})
+            entry["ms"] = round(entry["ms"] + seconds * 1000, 3)
+            entry["calls"] += 1
+            if peak is not None:
+                entry["peak_mb"] = round(max(entry.get("peak_mb", 0.0), peak / 2**20), 3)
+        result = {"event": "trace", "name": self.name, **self.fields,
+                  "total_ms": round((self.seconds or 0.0) * 1000, 3), "spans": spans, "counters": self.counters}
+        if self.profile_path:
+            result["profile"] = self.profile_path
+        return result
+
+
+def current():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def activate(trace: Trace):
+    # Делает trace текущим для участков в этом потоке
+    previous = current()
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def span(name: str):
+    # Таймер участка. Без активного замера ничего не делает, поэтому им можно размечать библиотечный код
+    trace = current()
+    if trace is None:
+        yield
+        return
+    memory = tracemalloc.is_tracing() and PROFILE_MODE in ("memory", "all")
+    if memory:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - base if memory else None
+        trace.add(name, seconds, peak)
+
+
+def count(name: str, value: int = 1):
+    trace = current()
+    if trace is not None:
+        trace.count(name, value)
+
+
+@contextmanager
+def trace(name: str, log: bool = True, into: Trace = None, **fields):
+    # Замер целиком: включает tracemalloc/cProfile по HVIZ_PROFILE, по завершении пишет в лог
+    # структурированную запись (JSON) с временами участков и счетчиками. into — продолжить замер,
+    # начатый в другом потоке (cProfile и tracemalloc видят только текущий поток)
+    result = into if into is not None else Trace(name, **fields)
+    started_tracing = False
+    profiler = None
+    if PROFILE_MODE in ("memory", "all") and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+    if PROFILE_MODE in ("cprofile", "all"):
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with activate(result):
+            yield result
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            result.profile_path = _dump_profile(profiler, name)
+        if started_tracing:
+            tracemalloc.stop()
+        result.finish(log)
+
+
+def _dump_profile(profiler, name: str):
+    # Сохраняет .prof для snakeviz/pstats и пишет в лог самые тяжелые функции
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+        profiler.dump_stats(path)
+    except OSError:
+        path = None
+    if logger.isEnabledFor(logging.DEBUG):
+        import io
+        import pstats
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(15)
+        logger.debug(out.getvalue())
+    return path
+
+
+def configure_logging(level: str = None):
+    # Логи CLI: по строке JSON на замер в stderr. Уровень — HVIZ_LOG_LEVEL (по умолчанию INFO)
+    level = (level or os.environ.get("HVIZ_LOG_LEVEL", "INFO")).upper()
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
@@ -0,0 +1,63 @@
+import numpy as np
+
+from core.grid import Grid
+from core.parallel import parallel_block, parallel_probability_density, parallel_real_wavefunction
+from core.sparse import sparse_probability_density
+
+DEFAULT_LEVELS = 3
+
+
+def refinement_resolutions(target: int, levels: int = DEFAULT_LEVELS):
+    # Цепочка N_{k+1} = 2 N_k - 1: каждый узел грубой сетки совпадает с четным узлом следующей.
+    # Последняя ступень — наименьшая такая, не меньшая target
+    coarse = -(-(target - 1) // 2**(levels - 1)) + 1
+    return [(coarse - 1) * 2**k + 1 for k in range(levels)]
+
+
+def progressive_density(n: int, l: int, m: int, extent: float, resolutions, cancelled=lambda: False, cache=None,
+                        real: bool = False, dtype=np.float64, backend: str = None, sparse: bool = False):
+    # Генератор (grid, density) от грубой сетки к точной. На каждой ступени значения предыдущей
+    # переносятся в четные узлы, а считаются только 7 из 8 подрешеток с нечетными индексами.
+    # cancelled() проверяется между подрешетками; при отмене генератор просто завершается.
+    # Первая ступень и каждая подрешетка считаются слоями в пуле core.parallel или ядром backend
+    # (core.backends, по умолчанию HVIZ_BACKEND).
+    # real=True — вместо |psi|^2 вещественная psi со знаком (вещественный базис), плотность — ее квадрат.
+    # cache (core.cache.DensityCache): последняя ступень сохраняется, а если она уже есть в кэше,
+    # генератор сразу отдает только ее.
+    # sparse=True (только для плотности) — последняя ступень считается не уточнением полной сетки, а
+    # core.sparse.sparse_probability_density: память и счет растут с занятым объемом, а не с N^3
+    quantity = "psi" if real else "density"
+    if cache is not None:
+        final = Grid(extent, resolutions[-1], dtype)
+        values = cache.get_sparse(n, l, m, final) if sparse else cache.get(n, l, m, final, quantity)
+        if values is not None:
+            yield final, values
+            return
+    previous = None
+    for resolution in resolutions:
+        if cancelled():
+            return
+        grid = Grid(extent, resolution, dtype)
+        if sparse and resolution == resolutions[-1]:
+            values = sparse_probability_density(n, l, m, grid)
+        elif previous is None or 2 * previous.shape[0] - 1 != resolution:
+            if real:
+                values = parallel_real_wavefunction(n, l, m, grid, backend=backend)
+            else:
+                values = parallel_probability_density(n, l, m, grid, backend=backend)
+        else:
+            values = np.empty(grid.shape, dtype=grid.dtype)
+            values[::2, ::2, ::2] = previous
+            for parity in [(a, b, c) for a in (0, 1) for b in (0, 1) for c in (0, 1)][1:]:
+                if cancelled():
+                    return
+                iy, ix, iz = (np.arange(p, resolution, 2) for p in parity)
+                parallel_block(n, l, m, extent, resolution, iy, ix, iz, grid.dtype, real=real, backend=backend,
+                               out=values[parity[0]::2, parity[1]::2, parity[2]::2])
+        previous = values
+        if cache is not None and resolution == resolutions[-1]:
+            if sparse:
+                cache.put_sparse(n, l, m, grid, values)
+            else:
+                cache.put(n, l, m, grid, values, quantity)
+        yield grid, values
@@ -0,0 +1,23 @@
+import numpy as np
+
+from core import kernels
+
+
+def sample_orbital_points(n: int, l: int, m: int, count: int, seed=None, dtype=np.float64):
+    # Точки облака, распределенные строго по |psi|^2 без трехмерной сетки:
+    # r — обратной функцией распределения r^2 R_nl^2, cos(theta) — по |Y_lm|^2, phi — равномерно
+    # (|Y_lm|^2 от phi не зависит). Возвращает x, y, z и |psi|^2 в этих точках.
+    rng = np.random.default_rng(seed)
+    r_table, _, r_cdf = kernels.radial_distribution(n, l)
+    t_table, _, t_cdf = kernels.polar_distribution(l, m)
+
+    r = np.interp(rng.random(count), r_cdf, r_table)
+    cos_t = np.interp(rng.random(count), t_cdf, t_table)
+    phi = rng.random(count) * (2 * np.pi)
+
+    sin_t = np.sqrt(1 - cos_t**2)
+    x = r * sin_t * np.cos(phi)
+    y = r * sin_t * np.sin(phi)
+    z = r * cos_t
+    values = kernels.radial(n, l, r)**2 * (kernels.legendre_cartesian(l, m, cos_t, 1.0) * sin_t**abs(m))**2
+    return tuple(a.astype(dtype, copy=False) for a in (x, y, z, values))
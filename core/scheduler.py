@@ -0,0 +1,140 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 2
+
+
+class Cancelled(Exception):
+    # Бросается CancelToken.check(): задача прерывается между порциями работы без ошибки в интерфейсе
+    pass
+
+
+class CancelToken:
+    # Флаг отмены, который задача проверяет между порциями работы. Вызов token() возвращает флаг,
+    # поэтому токен можно передать как cancelled= в core.progressive.progressive_density
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def __call__(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+
+class Job:
+    def __init__(self, key, lane):
+        self.key = key
+        self.lane = lane
+        self.token = CancelToken()
+        self.timer = None
+        self.future = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token.cancelled
+
+
+class Scheduler:
+    # Общий планировщик фоновых расчетов интерфейса:
+    # * ограниченный пул потоков вместо отдельного потока на каждый щелчок;
+    # * задачи с одинаковым ключом, которые еще не завершились, сливаются в одну;
+    # * новая задача в той же полосе (lane) отменяет предыдущую, результат отмененной отбрасывается;
+    # * delay откладывает запуск: задача, вытесненная за это время, не начинает считать вовсе.
+    # deliver(callback, *args) передает результат в поток интерфейса (для Tk — через after)
+    def __init__(self, workers: int = DEFAULT_WORKERS, deliver=None):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hviz-job")
+        self._deliver = deliver or (lambda callback, *args: callback(*args))
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._lanes = {}
+
+    def submit(self, key, func, *args, lane=None, delay: float = 0.0, on_result=None, on_error=None) -> Job:
+        # func(*args, cancel=token) выполняется в пуле; on_result(result) и on_error(error) вызываются
+        # через deliver и только если задача к этому моменту не отменена
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.cancelled:
+                return job
+            if lane is not None and lane in self._lanes:
+                self._cancel(self._lanes[lane])
+            job = Job(key, lane)
+            self._jobs[key] = job
+            if lane is not None:
+                self._lanes[lane] = job
+        start = lambda: self._start(job, func, args, on_result, on_error)
+        if delay > 0:
+            job.timer = threading.Timer(delay, start)
+            job.timer.daemon = True
+            job.timer.start()
+        else:
+            start()
+        return job
+
+    def cancel(self, lane=None, key=None):
+        with self._lock:
+            job = self._lanes.get(lane) if lane is not None else self._jobs.get(key)
+            if job is not None:
+                self._cancel(job)
+
+    def current(self, lane):
+        with self._lock:
+            return self._lanes.get(lane)
+
+    def shutdown(self):
+        with self._lock:
+            for job in list(self._jobs.values()):
+                self._cancel(job)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _cancel(self, job: Job):
+        # Вызывается под _lock
+        job.token.cancel()
+        if job.timer is not None:
+            job.timer.cancel()
+        self._forget(job)
+
+    def _forget(self, job: Job):
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        if job.lane is not None and self._lanes.get(job.lane) is job:
+            del self._lanes[job.lane]
+
+    def _start(self, job: Job, func, args, on_result, on_error):
+        if job.cancelled:
+            return
+        try:
+            job.future = self._pool.submit(self._run, job, func, args, on_result, on_error)
+        except RuntimeError:
+            # Пул уже остановлен (закрытие окна)
+            job.token.cancel()
+
+    def _run(self, job: Job, func, args, on_result, on_error):
+        try:
+            job.token.check()
+            result = func(*args, cancel=job.token)
+        except Cancelled:
+            return
+        except Exception as error:
+            if on_error is not None and not job.cancelled:
+                self._deliver(self._if_current, job, on_error, error)
+            return
+        finally:
+            with self._lock:
+                self._forget(job)
+        if on_result is not None and not job.cancelled:
+            self._deliver(self._if_current, job, on_result, result)
+
+    @staticmethod
+    def _if_current(job: Job, callback, value):
+        # Последняя проверка уже в потоке интерфейса: задачу могли отменить, пока результат шел в очередь
+        if not job.cancelled:
+            callback(value)
@@ -0,0 +1,103 @@
+import numpy as np
+
+from core.grid import Grid
+from core.physics import density_at_points, probability_density_grid, real_wavefunction_grid, wavefunction_at_points
+from core.profiling import count, span
+
+AXES = {"x": (1.0, 0.0, 0.0), "y": (0.0, 1.0, 0.0), "z": (0.0, 0.0, 1.0)}
+DEFAULT_RESOLUTION = 512
+
+
+class Plane:
+    # Плоскость normal · r = offset (в боровских радиусах). Экранные оси u, v — проекции "правого" и
+    # "верхнего" направлений на плоскость: для y = c это (x, z), для z = c — (x, y), для x = c — (y, z)
+    def __init__(self, normal=AXES["y"], offset: float = 0.0):
+        normal = np.asarray(normal, dtype=np.float64)
+        length = np.linalg.norm(normal)
+        if normal.shape != (3,) or length == 0:
+            raise ValueError("Нормаль плоскости должна быть ненулевым трехмерным вектором")
+        self.normal = normal / length
+        self.offset = float(offset)
+
+    @classmethod
+    def axis(cls, name: str, offset: float = 0.0) -> "Plane":
+        return cls(AXES[name], offset)
+
+    @property
+    def axis_name(self):
+        # Имя оси для плоскостей, перпендикулярных осям координат, иначе None
+        for name, normal in AXES.items():
+            if np.allclose(np.abs(self.normal), normal):
+                return name
+        return None
+
+    @property
+    def origin(self) -> np.ndarray:
+        return self.normal * self.offset
+
+    def basis(self):
+        dominant = int(np.argmax(np.abs(self.normal)))
+        right = np.array(AXES["y" if dominant == 0 else "x"])
+        up = np.array(AXES["y" if dominant == 2 else "z"])
+        u = right - (right @ self.normal) * self.normal
+        u /= np.linalg.norm(u)
+        v = up - (up @ self.normal) * self.normal - (up @ u) * u
+        length = np.linalg.norm(v)
+        v = v / length if length > 1e-12 else np.cross(self.normal, u)
+        return u, v
+
+    def points(self, extent: float, resolution: int):
+        # Узлы квадрата [-extent, extent]^2 в плоскости: координаты вдоль u и v и x, y, z
+        # с раскладкой [v, u] (строки — вертикальная ось изображения)
+        coords = np.linspace(-extent, extent, resolution)
+        u, v = self.basis()
+        a, b = coords[None, :], coords[:, None]
+        x, y, z = (self.origin[i] + a * u[i] + b * v[i] for i in range(3))
+        return coords, x, y, z
+
+    def label(self) -> str:
+        name = self.axis_name
+        if name is not None:
+            return f"{name} = {self.offset * float(self.normal @ AXES[name]):+.2f} a0"
+        nx, ny, nz = self.normal
+        return f"n = ({nx:.2f}, {ny:.2f}, {nz:.2f}), d = {self.offset:+.2f} a0"
+
+
+class Slice:
+    # Значения на плоском срезе: values[v, u] и общие для обеих осей координаты coords (в a0)
+    def __init__(self, values: np.ndarray, coords: np.ndarray, plane: Plane, signed: bool):
+        self.values = values
+        self.coords = coords
+        self.plane = plane
+        self.signed = signed
+
+    @property
+    def extent(self) -> float:
+        return float(self.coords[-1])
+
+
+def evaluate_slice(n: int, l: int, m: int, plane: Plane, extent: float, resolution: int = DEFAULT_RESOLUTION,
+                   real: bool = False, signed: bool = False, dtype=np.float32) -> Slice:
+    # psi (signed=True) или |psi|^2 только в узлах двумерной решетки resolution^2 на плоскости:
+    # 1024^2 точек стоят как куб ~100^3, поэтому срез можно пересчитывать при каждом движении ползунка
+    with span("срез"):
+        coords, x, y, z = plane.points(extent, resolution)
+        if signed:
+            values = wavefunction_at_points(n, l, m, x, y, z, real=real)
+        else:
+            values = density_at_points(n, l, m, x, y, z, real=real)
+        values = np.broadcast_to(values, (resolution, resolution)).astype(dtype)
+    count("точек среза", values.size)
+    return Slice(values, coords, plane, signed)
+
+
+def peak_value(n: int, l: int, m: int, extent: float, real: bool = False, signed: bool = False,
+               resolution: int = 41) -> float:
+    # Оценка max |psi|^2 (или max |psi|) по грубой сетке: общий масштаб цвета для всех положений
+    # плоскости, чтобы при движении ползунка было видно затухание, а не перенормировку
+    grid = Grid(extent, resolution)
+    if real:
+        peak = float(np.max(real_wavefunction_grid(n, l, m, grid)**2))
+    else:
+        peak = float(np.max(probability_density_grid(n, l, m, grid)))
+    return np.sqrt(peak) if signed else peak
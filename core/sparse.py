@@ -0,0 +1,143 @@
+import numpy as np
+
+from core import kernels
+from core.grid import Grid
+from core.physics import density_at_indices
+
+DEFAULT_BRICK = 8
+# Отрисовка отсекает точки ниже 0.05 максимума, порог разреживания берется с запасом
+DEFAULT_THRESHOLD = 0.01
+_TABLE_SIZE = 4096
+_SAFETY = 1.05
+
+
+class BlockSparseDensity:
+    # |psi|^2 только в "кирпичах" brick^3 сетки, где плотность может превышать порог.
+    # Последняя ступень в окне приложения (core.progressive, sparse=True) и PNG в batch.py рисуются
+    # из кирпичей напрямую: points() дает то же, что отбор точек по полной сетке в viz.plotter.
+    # origins — индексы [y, x, z] начала кирпичей, bricks — их значения (k, brick, brick, brick);
+    # кирпичи у края сетки дополнены нулями.
+    def __init__(self, grid: Grid, brick: int, origins: np.ndarray, bricks: np.ndarray):
+        self.grid = grid
+        self.brick = brick
+        self.origins = origins
+        self.bricks = bricks
+        self.max_value = float(bricks.max()) if bricks.size else 0.0
+
+    @property
+    def shape(self):
+        return self.grid.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.bricks.nbytes + self.origins.nbytes
+
+    @property
+    def occupancy(self) -> float:
+        # Доля объема сетки, для которой плотность действительно считалась
+        return self.bricks.size / float(np.prod(self.grid.shape))
+
+    def _indices(self):
+        offsets = np.arange(self.brick)
+        return tuple(self.origins[:, axis, None] + offsets for axis in range(3))
+
+    def points(self, threshold: float = 0.05):
+        # Координаты и нормированные значения узлов, где density / max > threshold
+        if self.max_value <= 0:
+            empty = np.empty(0, dtype=self.grid.dtype)
+            return empty, empty, empty, empty
+        iy, ix, iz = self._indices()
+        mask = self.bricks > threshold * self.max_value
+        k, a, b, c = np.nonzero(mask)
+        y_idx, x_idx, z_idx = iy[k, a], ix[k, b], iz[k, c]
+        valid = (y_idx < self.grid.resolution) & (x_idx < self.grid.resolution) & (z_idx < self.grid.resolution)
+        lin = self.grid.lin
+        values = self.bricks[k, a, b, c][valid] / self.max_value
+        return lin[x_idx[valid]], lin[y_idx[valid]], lin[z_idx[valid]], values
+
+    def to_dense(self) -> np.ndarray:
+        out = np.zeros(self.grid.shape, dtype=self.bricks.dtype)
+        for (y0, x0, z0), brick in zip(self.origins, self.bricks):
+            view = out[y0:y0 + self.brick, x0:x0 + self.brick, z0:z0 + self.brick]
+            view[...] = brick[:view.shape[0], :view.shape[1], :view.shape[2]]
+        return out
+
+
+def _interval_max(table: np.ndarray, lo: np.ndarray, hi: np.ndarray, span: float, offset: float = 0.0):
+    # Верхняя оценка max table на [lo, hi]: значения на концах и во всех локальных максимумах внутри
+    position = np.linspace(offset, offset + span, len(table))
+    bound = np.maximum(np.interp(lo, position, table), np.interp(hi, position, table))
+    peaks = np.flatnonzero((table[1:-1] > table[:-2]) & (table[1:-1] >= table[2:])) + 1
+    if len(peaks):
+        inside = (position[peaks] >= lo[:, None]) & (position[peaks] <= hi[:, None])
+        bound = np.maximum(bound, np.where(inside, table[peaks], 0).max(axis=1))
+    return bound * _SAFETY
+
+
+def _box_bounds(lo: np.ndarray, hi: np.ndarray):
+    # Диапазоны r и cos(theta) по осям-параллельным коробкам [lo, hi] (столбцы y, x, z)
+    nearest = np.clip(0, lo, hi)
+    farthest = np.maximum(np.abs(lo), np.abs(hi))
+    r_min = np.sqrt((nearest**2).sum(axis=1))
+    r_max = np.sqrt((farthest**2).sum(axis=1))
+    rho_min = np.sqrt((nearest[:, :2]**2).sum(axis=1))
+    rho_max = np.sqrt((farthest[:, :2]**2).sum(axis=1))
+    z_lo, z_hi = lo[:, 2], hi[:, 2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_max = np.where(z_hi >= 0, z_hi / np.hypot(rho_min, z_hi), z_hi / np.hypot(rho_max, z_hi))
+        t_min = np.where(z_lo <= 0, z_lo / np.hypot(rho_min, z_lo), z_lo / np.hypot(rho_max, z_lo))
+    touches_origin = r_min == 0
+    t_max = np.where(touches_origin | np.isnan(t_max), 1.0, t_max)
+    t_min = np.where(touches_origin | np.isnan(t_min), -1.0, t_min)
+    return r_min, r_max, t_min, t_max
+
+
+def _significant(grid, origins, size, cutoff, radial_table, angular_table, r_span):
+    lin = grid.lin.astype(np.float64)
+    last = grid.resolution - 1
+    lo = lin[np.minimum(origins, last)]
+    hi = lin[np.minimum(origins + size - 1, last)]
+    r_min, r_max, t_min, t_max = _box_bounds(lo, hi)
+    bound = _interval_max(radial_table, r_min, r_max, r_span) * _interval_max(angular_table, t_min, t_max, 2.0, -1.0)
+    return bound >= cutoff
+
+
+def sparse_probability_density(n: int, l: int, m: int, grid: Grid, brick: int = DEFAULT_BRICK,
+                               threshold: float = DEFAULT_THRESHOLD) -> BlockSparseDensity:
+    # Октодерево над сеткой: крупные блоки, чья верхняя оценка |psi|^2 = max R^2 * max |Y|^2 по блоку
+    # ниже threshold * max|psi|^2, отбрасываются целиком (пустота и угловые узлы), остальные делятся
+    # на 8 частей до размера brick, после чего плотность считается только в оставшихся кирпичах
+    r_span = grid.extent * np.sqrt(3)
+    radial_table = kernels.radial(n, l, np.linspace(0, r_span, _TABLE_SIZE))**2
+    t = np.linspace(-1.0, 1.0, _TABLE_SIZE)
+    angular_table = kernels.legendre_cartesian(l, m, t, 1.0)**2 * (1 - t**2)**abs(m)
+    # Порог относительно максимума, достижимого на узлах: ближайший к ядру узел задает наименьший радиус
+    r_nearest = np.sqrt(3) * float(np.min(np.abs(grid.lin)))
+    reachable = np.linspace(0, r_span, _TABLE_SIZE) >= r_nearest - r_span / _TABLE_SIZE
+    cutoff = threshold * radial_table[reachable].max() * angular_table.max()
+
+    size = brick
+    while size < grid.resolution:
+        size *= 2
+    origins = np.zeros((1, 3), dtype=np.int64)
+    while True:
+        origins = origins[_significant(grid, origins, size, cutoff, radial_table, angular_table, r_span)]
+        if size == brick or not len(origins):
+            break
+        size //= 2
+        corners = np.array([(a, b, c) for a in (0, 1) for b in (0, 1) for c in (0, 1)]) * size
+        origins = (origins[:, None, :] + corners[None, :, :]).reshape(-1, 3)
+        origins = origins[(origins < grid.resolution).all(axis=1)]
+
+    offsets = np.arange(brick)
+    if not len(origins):
+        return BlockSparseDensity(grid, brick, origins, np.zeros((0, brick, brick, brick), dtype=grid.dtype))
+    iy, ix, iz = (np.minimum(origins[:, axis, None] + offsets, grid.resolution - 1) for axis in range(3))
+    bricks = density_at_indices(n, l, m, grid.extent, grid.resolution,
+                                iy[:, :, None, None], ix[:, None, :, None], iz[:, None, None, :])
+    # Узлы за краем сетки (дополнение кирпича) обнуляются
+    outside = ((origins[:, 0, None] + offsets >= grid.resolution)[:, :, None, None]
+               | (origins[:, 1, None] + offsets >= grid.resolution)[:, None, :, None]
+               | (origins[:, 2, None] + offsets >= grid.resolution)[:, None, None, :])
+    bricks[np.broadcast_to(outside, bricks.shape)] = 0
+    return BlockSparseDensity(grid, brick, origins, bricks.astype(grid.dtype, copy=False))
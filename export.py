@@ -0,0 +1,51 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from core import profiling
+from core.autosize import auto_grid
+from core.export import DEFAULT_CHUNK, DEFAULT_SLAB_MB, QUANTITIES, export_volume
+from core.grid import Grid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Потоковая выгрузка объема орбитали на диск (.npy, .zarr, .h5)")
+    parser.add_argument("n", type=int)
+    parser.add_argument("l", type=int)
+    parser.add_argument("m", type=int)
+    parser.add_argument("--out", required=True, help="путь с расширением .npy, .zarr, .h5 или .hdf5")
+    parser.add_argument("--resolution", type=int, default=512, help="узлов сетки по оси (по умолчанию 512)")
+    parser.add_argument("--extent", type=float, default=None, help="полуразмер куба в a0 (по умолчанию — авто)")
+    parser.add_argument("--quantity", choices=QUANTITIES, default="density",
+                        help="density — |psi|^2, psi — вещественная волновая функция со знаком")
+    parser.add_argument("--dtype", choices=("float32", "float64"), default="float32")
+    parser.add_argument("--slab-mb", type=float, default=DEFAULT_SLAB_MB, help="размер слоя в памяти")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="ребро чанка для .zarr и .h5")
+    parser.add_argument("--backend", default=None, help="numpy, numba или auto (по умолчанию HVIZ_BACKEND)")
+    args = parser.parse_args(argv)
+
+    n, l, m = args.n, args.l, args.m
+    if n < 1 or not 0 <= l < n or not -l <= m <= l:
+        parser.error("некорректные квантовые числа")
+    profiling.configure_logging()
+    extent = args.extent or auto_grid(n, l, m).extent
+    grid = Grid(extent, args.resolution, np.dtype(args.dtype))
+    print(f"Орбиталь n={n} l={l} m={m}: {args.resolution}^3 ({grid.nbytes / 2**30:.2f} ГБ), +/-{extent:.1f} a0")
+
+    started = time.perf_counter()
+
+    def progress(done, total):
+        elapsed = time.perf_counter() - started
+        print(f"\r{done}/{total} строк, {elapsed:.1f} с", end="", flush=True)
+
+    with profiling.trace("export", n=n, l=l, m=m, resolution=args.resolution, out=args.out):
+        metadata = export_volume(args.out, n, l, m, grid, args.quantity, args.slab_mb, args.chunk, args.backend,
+                                 progress)
+    print(f"\nСохранено: {args.out} (вероятность внутри куба {metadata['probability']:.4f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,23 @@
+import time
+
+# Отсчет времени запуска для STARTUP_BUDGET_MS: до первого показа окна загружаются только tkinter и
+# customtkinter, numpy, matplotlib, plotly и ядро расчетов импортируются при первом обращении
+_STARTED = time.perf_counter()
+
 import tkinter as tk
 import customtkinter as ctk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from matplotlib.figure import Figure
-import numpy as np
-import threading
+import multiprocessing
 import sys
 import os
-from io import BytesIO
-from PIL import Image, ImageTk
 
-from core.physics import probability_density
-from core.grid import generate_grid
-from viz.plotter import create_orbital_figure_matplotlib, create_orbital_figure
+from core import profiling
+from core.scheduler import Scheduler
+
+STARTUP_BUDGET_MS = 500
+# Пауза перед запуском расчета: щелчки быстрее нее вытесняют друг друга, не начиная считать
+INPUT_DEBOUNCE_S = 0.12
+# Разрешение среза в окне: кадр (расчет, изолинии и отрисовка) укладывается в ~0.1 с даже для больших n
+SLICE_RESOLUTION = 384
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
@@ -54,24 +60,37 @@ class App(ctk.CTk):
         self.m_label.grid(row=6, column=0, padx=20, pady=(10, 0), sticky="w")
         self.m_entry = ctk.CTkEntry(self.sidebar, placeholder_text="напр. 0")
         self.m_entry.insert(0, "0")
-        self.m_entry.grid(row=7, column=0, padx=20, pady=(0, 20))
+        self.m_entry.grid(row=7, column=0, padx=20, pady=(0, 10))
+
+        # Вещественный базис: p_x, p_y, d_xy вместо комплексных m, лепестки окрашены по знаку psi
+        self.real_switch = ctk.CTkSwitch(self.sidebar, text="Вещественные (pₓ, d_xy)")
+        self.real_switch.grid(row=8, column=0, padx=20, pady=(0, 15), sticky="w")
 
         self.calc_button = ctk.CTkButton(self.sidebar, text="Визуализировать", command=self.on_visualize)
-        self.calc_button.grid(row=8, column=0, padx=20, pady=(10, 5))
+        self.calc_button.grid(row=9, column=0, padx=20, pady=(10, 5))
 
         self.browser_button = ctk.CTkButton(self.sidebar, text="Открыть в браузере",
                                             command=lambda: self.on_browser_visualize(sliced=False),
                                             fg_color="transparent", border_width=2)
-        self.browser_button.grid(row=9, column=0, padx=20, pady=5)
+        self.browser_button.grid(row=10, column=0, padx=20, pady=5)
 
         # НОВАЯ КНОПКА ДЛЯ СРЕЗА
         self.slice_button = ctk.CTkButton(self.sidebar, text="Открыть СРЕЗ в браузере",
                                           command=lambda: self.on_browser_visualize(sliced=True),
                                           fg_color="#A36100", hover_color="#7A4900")
-        self.slice_button.grid(row=10, column=0, padx=20, pady=5)
+        self.slice_button.grid(row=11, column=0, padx=20, pady=5)
+
+        self.slice_app_button = ctk.CTkButton(self.sidebar, text="Срез в приложении", command=self.on_slice_visualize,
+                                              fg_color="transparent", border_width=2, border_color="#A36100")
+        self.slice_app_button.grid(row=12, column=0, padx=20, pady=5)
+
+        self.status_label = ctk.CTkLabel(self.sidebar, text="Готов", text_color="gray", wraplength=210,
+                                         justify="left")
+        self.status_label.grid(row=13, column=0, padx=20, pady=20)
 
-        self.status_label = ctk.CTkLabel(self.sidebar, text="Готов", text_color="gray")
-        self.status_label.grid(row=11, column=0, padx=20, pady=20)
+        # Все фоновые расчеты идут через один планировщик: ограниченный пул, слияние одинаковых запросов,
+        # отмена вытесненных и отбрасывание устаревших результатов
+        self.scheduler = Scheduler(deliver=lambda callback, *args: self.after(0, callback, *args))
 
         self.content_frame = ctk.CTkFrame(self, fg_color="transparent")
         self.content_frame.grid(row=0, column=1, padx=20, pady=20, sticky="nsew")
@@ -79,6 +98,10 @@ class App(ctk.CTk):
         self.content_frame.grid_rowconfigure(0, weight=1)
 
         self.cards = []
+        self._pending_previews = []
+        self.thumbnails = None
+        self.startup_ms = None
+        self.bind("<Map>", self.on_first_map, add="+")
         self.preview_images = {}
         self.menu_frame = ctk.CTkScrollableFrame(self.content_frame, label_text="Быстрый выбор орбиталей",
                                                  label_font=ctk.CTkFont(size=18, weight="bold"))
@@ -89,55 +112,56 @@ class App(ctk.CTk):
         self.plot_frame.grid_columnconfigure(0, weight=1)
         self.plot_frame.grid_rowconfigure(0, weight=1)
 
+        # Панель среза: ось и положение плоскости. Срез двумерный, поэтому пересчитывается прямо при
+        # движении ползунка; события, пришедшие во время отрисовки, сливаются в одно
+        self.slice_controls = ctk.CTkFrame(self.plot_frame, fg_color="transparent")
+        self.slice_controls.grid_columnconfigure(2, weight=1)
+        self.slice_axis = ctk.CTkSegmentedButton(self.slice_controls, values=["x", "y", "z"],
+                                                 command=lambda _: self.request_slice())
+        self.slice_axis.set("y")
+        self.slice_axis.grid(row=0, column=0, padx=(10, 5))
+        self.slice_offset_label = ctk.CTkLabel(self.slice_controls, text="", width=110)
+        self.slice_offset_label.grid(row=0, column=1, padx=5)
+        self.slice_slider = ctk.CTkSlider(self.slice_controls, from_=-1, to=1, command=lambda _: self.request_slice())
+        self.slice_slider.grid(row=0, column=2, padx=(5, 10), sticky="ew")
+        self._slice_state = None
+        self._slice_pending = False
+
         self.canvas = None
         self.toolbar = None
         self.show_menu()
 
-    # Методы generate_preview, setup_menu_cards, select_preset оставляем без изменений...
-    def generate_preview(self, n, l, m, width=220, height=100):
+    def load_preview(self, path, label, width=220, height=100):
+        # Вызывается в главном потоке: PhotoImage нельзя создавать из рабочих потоков
+        from PIL import Image, ImageTk
         try:
-            extent = 3.0 * (n ** 2)
-            resolution = 42
-            X, Y, Z, R, Theta, Phi = generate_grid(extent, resolution)
-            prob_density = probability_density(n, l, m, R, Theta, Phi)
-            fig = Figure(figsize=(width / 100, height / 100), dpi=150, facecolor='black')
-            ax = fig.add_subplot(111, projection='3d')
-            ax.set_facecolor('black')
-            max_val = np.max(prob_density)
-            vol_data = prob_density / max_val if max_val > 0 else prob_density
-            mask = vol_data > 0.05
-            x_vis, y_vis, z_vis, v_vis = X[mask], Y[mask], Z[mask], vol_data[mask]
-            if len(x_vis) > 0:
-                max_preview_points = 12000
-                if len(x_vis) > max_preview_points:
-                    v_normalized = v_vis / np.max(v_vis)
-                    probabilities = 0.1 + 0.9 * v_normalized
-                    probabilities = probabilities / np.sum(probabilities)
-                    indices = np.random.choice(len(x_vis), size=max_preview_points, replace=False, p=probabilities)
-                    x_vis, y_vis, z_vis, v_vis = x_vis[indices], y_vis[indices], z_vis[indices], v_vis[indices]
-                v_enhanced = np.power(v_vis, 0.5)
-                v_normalized = (v_enhanced - np.min(v_enhanced)) / (np.max(v_enhanced) - np.min(v_enhanced) + 1e-10)
-                from matplotlib import cm
-                cmap = cm.get_cmap('plasma')
-                colors = cmap(v_normalized)
-                colors[:, 3] = np.clip(0.4 + 0.4 * v_normalized, 0.1, 0.8)
-                ax.scatter(x_vis, y_vis, z_vis, c=colors, s=3, marker='o', edgecolors='none', depthshade=False)
-                ax.scatter([0], [0], [0], color='red', s=12, edgecolors='white', linewidth=0.6)
-                limit = np.max(np.abs(x_vis)) * 1.1
-                ax.set_xlim(-limit, limit)
-                ax.set_ylim(-limit, limit)
-                ax.set_zlim(-limit, limit)
-            ax.set_axis_off()
-            fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-            buf = BytesIO()
-            fig.savefig(buf, format='png', dpi=150, bbox_inches='tight', pad_inches=0, facecolor='black')
-            buf.seek(0)
-            img = Image.open(buf)
-            img = img.resize((width, height), Image.Resampling.LANCZOS)
-            return ImageTk.PhotoImage(img)
-        except Exception as e:
+            img = Image.open(path) if path else Image.new('RGB', (width, height), color='black')
+        except OSError:
             img = Image.new('RGB', (width, height), color='black')
-            return ImageTk.PhotoImage(img)
+        preview_img = ImageTk.PhotoImage(img)
+        self.preview_images[path or id(label)] = preview_img
+        label.configure(image=preview_img, text="")
+
+    def start_thumbnails(self, cancel=None):
+        # Запускается в фоне после показа окна: готовые превью берутся с диска, остальные рисуются в пуле
+        from viz.thumbnails import ThumbnailService
+
+        self.thumbnails = ThumbnailService()
+        for p, label, priority in self._pending_previews:
+            cached = self.thumbnails.cached(p['n'], p['l'], p['m'], 220, 100)
+            if cached:
+                self.after(0, lambda path=cached, lbl=label: self.load_preview(path, lbl))
+            else:
+                self.thumbnails.request(p['n'], p['l'], p['m'], 220, 100, priority=priority,
+                                        callback=lambda path, lbl=label: self.after(
+                                            0, lambda: self.load_preview(path, lbl)))
+        self._pending_previews = []
+
+    def on_first_map(self, event):
+        if event.widget is not self or self.startup_ms is not None:
+            return
+        self.startup_ms = (time.perf_counter() - _STARTED) * 1000
+        self.scheduler.submit("thumbnails", self.start_thumbnails)
 
     def setup_menu_cards(self):
         presets = [
@@ -161,14 +185,8 @@ class App(ctk.CTk):
             preview_label = ctk.CTkLabel(card, text="Загрузка...", width=220, height=100, corner_radius=8)
             preview_label.pack(padx=15, pady=(15, 5))
             preview_label.bind("<Button-1>", select_cmd)
-
-            def generate_and_set(params=p, label=preview_label):
-                preview_img = self.generate_preview(params['n'], params['l'], params['m'])
-                key = f"{params['n']}_{params['l']}_{params['m']}"
-                self.preview_images[key] = preview_img
-                self.after(0, lambda img=preview_img, lbl=label: lbl.configure(image=img, text=""))
-
-            threading.Thread(target=generate_and_set, daemon=True).start()
+            # Верхние ряды видны сразу после запуска и рисуются первыми
+            self._pending_previews.append((p, preview_label, i // cols))
             label = ctk.CTkLabel(card, text=p["name"], font=ctk.CTkFont(size=14, weight="bold"))
             label.pack(padx=15, pady=2)
             label.bind("<Button-1>", select_cmd)
@@ -186,6 +204,7 @@ class App(ctk.CTk):
         self.l_entry.insert(0, str(p["l"]))
         self.m_entry.delete(0, tk.END);
         self.m_entry.insert(0, str(p["m"]))
+        self.scheduler.cancel(lane="plot")
         self.status_label.configure(text=f"Выбрано: {p['name']}", text_color="white")
 
     def show_menu(self):
@@ -202,60 +221,212 @@ class App(ctk.CTk):
             n, l, m = int(self.n_entry.get()), int(self.l_entry.get()), int(self.m_entry.get())
             if n < 1 or not (0 <= l < n) or not (-l <= m <= l): raise ValueError("Некорректные числа")
             self.show_plot()
+            self.hide_slice_controls()
             self.status_label.configure(text="Вычисление...", text_color="orange")
-            self.calc_button.configure(state="disabled")
-            threading.Thread(target=self.calculate, args=(n, l, m), daemon=True).start()
+            real = bool(self.real_switch.get())
+            # Повторный щелчок по той же орбитали сливается с идущим расчетом, другая орбиталь его отменяет
+            self.scheduler.submit(("plot", n, l, m, real), self.calculate, n, l, m, real, lane="plot",
+                                  delay=INPUT_DEBOUNCE_S, on_error=self.show_error)
         except ValueError as e:
             tk.messagebox.showerror("Ошибка", str(e))
 
-    def calculate(self, n, l, m):
-        try:
-            X, Y, Z, R, Theta, Phi = generate_grid(3.0 * (n ** 2), 55)
-            prob_density = probability_density(n, l, m, R, Theta, Phi)
-            data = {'density': prob_density, 'X': X, 'Y': Y, 'Z': Z, 'n': n, 'l': l, 'm': m}
+    def calculate(self, n, l, m, real=False, cancel=None):
+        # Сначала грубая сетка (~15^3), затем уточнения, каждое заменяет рисунок.
+        # Выбор другой орбитали отменяет задачу: cancel проверяется между подрешетками и ступенями.
+        # Последняя ступень кэшируется: повторный просмотр сразу показывает готовую сетку.
+        # Плотность на последней ступени разреженная (core.sparse): считаются только кирпичи с заметной |psi|^2
+        from core.autosize import auto_grid
+        from core.cache import default_cache
+        from core.progressive import progressive_density, refinement_resolutions
+
+        extent = auto_grid(n, l, m, voxel_budget=55**3).extent
+        resolutions = refinement_resolutions(55)
+        if real:
+            # Вещественная psi со знаком в float32 по тем же ступеням, плотность — psi^2
+            import numpy as np
+            levels = ((grid, np.square(psi), psi) for grid, psi in
+                      progressive_density(n, l, m, extent, resolutions, cancelled=cancel, cache=default_cache(),
+                                          real=True, dtype=np.float32))
+        else:
+            levels = ((grid, density, None) for grid, density in
+                      progressive_density(n, l, m, extent, resolutions, cancelled=cancel, cache=default_cache(),
+                                          sparse=True))
+        # Замер на каждую ступень: расчет здесь, построение и отрисовка — в update_plot
+        progress = {'queued': 0}
+        clock = time.perf_counter()
+        for level, (grid, prob_density, psi) in enumerate(levels, 1):
+            trace = profiling.Trace("gui", n=n, l=l, m=m, level=level, resolution=grid.resolution, real=real)
+            trace.add("плотность", time.perf_counter() - clock)
+            progress['queued'] = level
+            data = {'density': prob_density, 'psi': psi, 'X': grid.x, 'Y': grid.y, 'Z': grid.z, 'n': n, 'l': l,
+                    'm': m, 'cancel': cancel, 'progress': progress, 'level': level, 'levels': len(resolutions),
+                    'final': grid.resolution == resolutions[-1], 'trace': trace}
             self.after(0, self.update_plot, data)
-        except Exception as e:
-            self.after(0, lambda: tk.messagebox.showerror("Ошибка", str(e))); self.after(0, self.reset_ui)
+            clock = time.perf_counter()
 
     def update_plot(self, data):
-        fig = create_orbital_figure_matplotlib(data['density'], data['X'], data['Y'], data['Z'], data['n'], data['l'],
-                                               data['m'])
+        # Устаревшие результаты и промежуточные ступени, которые уже обогнал более точный расчет, не рисуются
+        if data['cancel'].cancelled or data['level'] < data['progress']['queued']:
+            return
+        from viz.plotter import create_orbital_figure_matplotlib
+
+        self.hide_slice_controls()
+        with profiling.trace("gui", into=data['trace']) as trace:
+            fig = create_orbital_figure_matplotlib(data['density'], data['X'], data['Y'], data['Z'], data['n'],
+                                                   data['l'], data['m'], psi=data['psi'])
+            self.replace_canvas(fig)
+            with profiling.span("draw"):
+                self.canvas.draw()
+        self.reset_ui()
+        # Разбивка времени по этапам: где ушло время последней отрисовки
+        breakdown = f"\n{trace.seconds * 1000:.0f} мс: {trace.summary(3)}"
+        if not data['final']:
+            self.status_label.configure(text=f"Уточнение {data['level']}/{data['levels']}...{breakdown}",
+                                        text_color="orange")
+        else:
+            self.status_label.configure(text=f"Готово{breakdown}", text_color="green")
+
+    def replace_canvas(self, fig):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+
         if self.canvas: self.canvas.get_tk_widget().destroy()
         if self.toolbar: self.toolbar.destroy()
         self.canvas = FigureCanvasTkAgg(fig, master=self.plot_frame)
-        self.canvas.draw()
         self.canvas.get_tk_widget().grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
         self.toolbar = NavigationToolbar2Tk(self.canvas, self.plot_frame, pack_toolbar=False)
         self.toolbar.grid(row=1, column=0, sticky="ew")
-        self.reset_ui()
-        self.status_label.configure(text="Готово", text_color="green")
+
+    def on_slice_visualize(self):
+        try:
+            n, l, m = int(self.n_entry.get()), int(self.l_entry.get()), int(self.m_entry.get())
+            if n < 1 or not (0 <= l < n) or not (-l <= m <= l): raise ValueError("Некорректные числа")
+        except ValueError as e:
+            tk.messagebox.showerror("Ошибка", str(e))
+            return
+        from core.autosize import auto_grid
+        from core.slicing import peak_value
+
+        # Срез заменяет трехмерный рисунок: незавершенные ступени 3D-расчета отбрасываются
+        self.scheduler.cancel(lane="plot")
+        real = bool(self.real_switch.get())
+        extent = auto_grid(n, l, m, voxel_budget=55**3).extent
+        self._slice_state = {'n': n, 'l': l, 'm': m, 'real': real, 'extent': extent, 'figure': None,
+                             'scale': peak_value(n, l, m, extent, real=real, signed=real)}
+        self.slice_slider.configure(from_=-extent, to=extent, number_of_steps=200)
+        self.slice_slider.set(0)
+        self.show_plot()
+        self.slice_controls.grid(row=2, column=0, sticky="ew", pady=(0, 10))
+        self.render_slice()
+
+    def hide_slice_controls(self):
+        self._slice_state = None
+        self.slice_controls.grid_forget()
+
+    def request_slice(self):
+        if self._slice_state is None or self._slice_pending:
+            return
+        self._slice_pending = True
+        self.after_idle(self.render_slice)
+
+    def render_slice(self):
+        # Пересчет среза в главном потоке: SLICE_RESOLUTION^2 точек считаются за десятки миллисекунд
+        self._slice_pending = False
+        state = self._slice_state
+        if state is None:
+            return
+        from core.slicing import Plane, evaluate_slice
+        from viz.plotter import BOHR_TO_ANGSTROM, create_slice_figure_matplotlib, update_slice_figure_matplotlib
+
+        n, l, m, real = state['n'], state['l'], state['m'], state['real']
+        axis, offset = self.slice_axis.get(), self.slice_slider.get()
+        self.slice_offset_label.configure(text=f"{axis} = {offset * BOHR_TO_ANGSTROM:+.2f} Å")
+        with profiling.trace("slice", log=False, n=n, l=l, m=m, axis=axis) as trace:
+            plane_slice = evaluate_slice(n, l, m, Plane.axis(axis, offset), state['extent'], SLICE_RESOLUTION,
+                                         real=real, signed=real)
+            if state['figure'] is None:
+                state['figure'] = create_slice_figure_matplotlib(plane_slice, n, l, m, state['scale'], real)
+                self.replace_canvas(state['figure'])
+            else:
+                update_slice_figure_matplotlib(state['figure'], plane_slice, n, l, m, state['scale'], real)
+            with profiling.span("draw"):
+                self.canvas.draw()
+        self.status_label.configure(text=f"Срез {SLICE_RESOLUTION}²\n{trace.seconds * 1000:.0f} мс: {trace.summary(3)}",
+                                    text_color="green")
 
     def reset_ui(self):
         self.calc_button.configure(state="normal")
 
+    def show_error(self, error):
+        tk.messagebox.showerror("Ошибка", str(error))
+        self.reset_ui()
+
     # ОБНОВЛЕННЫЕ МЕТОДЫ ДЛЯ БРАУЗЕРА
     def on_browser_visualize(self, sliced=False):
         try:
             n, l, m = int(self.n_entry.get()), int(self.l_entry.get()), int(self.m_entry.get())
             if n < 1 or not (0 <= l < n) or not (-l <= m <= l): raise ValueError("Некорректные числа")
 
+            real = bool(self.real_switch.get())
+            key = ("browser", n, l, m, sliced, real)
+            running = self.scheduler.current("browser")
+            if running is not None and running.key == key:
+                # Та же страница уже готовится: повторный щелчок не запускает второй расчет и вкладку
+                self.status_label.configure(text="Страница уже готовится...", text_color="orange")
+                return
             msg = "Открываю срез в браузере..." if sliced else "Открываю браузер..."
             self.status_label.configure(text=msg, text_color="orange")
-            threading.Thread(target=self.calculate_browser, args=(n, l, m, sliced), daemon=True).start()
+            self.scheduler.submit(key, self.calculate_browser, n, l, m, sliced, real, lane="browser",
+                                  delay=INPUT_DEBOUNCE_S, on_result=self.on_browser_done, on_error=self.show_error)
         except ValueError as e:
             tk.messagebox.showerror("Ошибка", str(e))
 
-    def calculate_browser(self, n, l, m, sliced):
-        try:
-            X, Y, Z, R, Theta, Phi = generate_grid(3.2 * (n ** 2), 60)
-            prob_density = probability_density(n, l, m, R, Theta, Phi)
-            fig = create_orbital_figure(prob_density, X, Y, Z, n, l, m, sliced=sliced)
-            fig.show()
-            self.after(0, lambda: self.status_label.configure(text="Браузер открыт", text_color="green"))
-        except Exception as e:
-            self.after(0, lambda: tk.messagebox.showerror("Ошибка", str(e)))
+    def calculate_browser(self, n, l, m, sliced, real=False, cancel=None):
+        # Вкладка открывается, только если за время расчета не запросили другую страницу
+        from core.autosize import auto_grid
+        from core.cache import default_cache
+        from viz.browser import show_figure
+
+        with profiling.trace("browser", n=n, l=l, m=m, sliced=sliced, real=real) as trace:
+            with profiling.span("сетка"):
+                grid = auto_grid(n, l, m, voxel_budget=60**3)
+            if sliced:
+                # Плоскость y = 0 считается напрямую на решетке 1024^2, без трехмерного куба
+                from core.slicing import Plane, evaluate_slice
+                from viz.plotter import create_slice_figure
+                plane_slice = evaluate_slice(n, l, m, Plane.axis("y"), grid.extent, 1024, real=real, signed=real)
+                cancel.check()
+                fig = create_slice_figure(plane_slice, n, l, m, real=real)
+                name = f"orbital_{n}_{l}_{m}_slice{'_real' if real else ''}.html"
+            else:
+                from viz.mesh import orbital_isosurfaces
+                from viz.plotter import create_isosurface_figure
+                meshes = orbital_isosurfaces(n, l, m, grid, real=real, check=cancel.check, cache=default_cache())
+                with profiling.span("фигура plotly"):
+                    fig = create_isosurface_figure(meshes, n, l, m, real=real)
+                name = f"orbital_{n}_{l}_{m}{'_real' if real else ''}.html"
+            cancel.check()
+            show_figure(fig, name)
+        return f"Браузер открыт\n{trace.seconds * 1000:.0f} мс: {trace.summary(3)}"
+
+    def on_browser_done(self, text):
+        self.status_label.configure(text=text, text_color="green")
 
 
 if __name__ == "__main__":
+    # Превью рисуются в дочерних процессах; для собранного EXE это обязательно
+    multiprocessing.freeze_support()
     app = App()
-    app.mainloop()
\ No newline at end of file
+    if "--startup-time" in sys.argv:
+        # Замер бюджета запуска: время до первого показа окна, затем выход
+        def report():
+            shown = app.startup_ms is not None and app.startup_ms <= STARTUP_BUDGET_MS
+            print(f"Окно показано через {app.startup_ms or float('nan'):.0f} мс (бюджет {STARTUP_BUDGET_MS} мс)")
+            app.destroy()
+            sys.exit(0 if shown else 1)
+        app.after(200, report)
+    try:
+        app.mainloop()
+    finally:
+        app.scheduler.shutdown()
+        if app.thumbnails is not None:
+            app.thumbnails.shutdown()
\ No newline at end of file
@@ -1,8 +1,11 @@
 import sys
 import numpy as np
-from core.physics import probability_density
-from core.grid import generate_grid
-from viz.plotter import create_orbital_figure
+from core import profiling
+from core.autosize import auto_grid
+from core.cache import default_cache
+from viz.mesh import orbital_isosurfaces
+from viz.plotter import create_isosurface_figure
+from viz.browser import show_figure
 
 def get_quantum_numbers():
     print("=== Конфигурация ===")
@@ -28,6 +31,7 @@ def get_quantum_numbers():
             print("Ошибка: введите целое число.")
 
 def main():
+    profiling.configure_logging()
     print("Визуализатор орбиталей водорода")
     print("--------------------------------------")
     
@@ -36,20 +40,22 @@ def main():
         
         print(f"\nРасчет орбитали для n={n}, l={l}, m={m}...")
         
-        extent = 3.0 * (n**2)
-        resolution = 50 
-        
-        print(f"Генерация сетки (размер +/-{extent:.1f} a0, разрешение {resolution})...")
-        X, Y, Z, R, Theta, Phi = generate_grid(extent, resolution)
-        
-        print("Расчет волновых функций...")
-        prob_density = probability_density(n, l, m, R, Theta, Phi)
-        
-        print("Создание 3D модели...")
-        fig = create_orbital_figure(prob_density, X, Y, Z, n, l, m)
-        
-        print("Открытие визуализации в браузере...")
-        fig.show()
+        with profiling.trace("cli", n=n, l=l, m=m) as trace:
+            with profiling.span("сетка"):
+                grid = auto_grid(n, l, m, voxel_budget=50**3)
+            
+            print(f"Генерация сетки (размер +/-{grid.extent:.1f} a0, разрешение {grid.resolution})...")
+            
+            print("Расчет волновых функций и изоповерхностей...")
+            meshes = orbital_isosurfaces(n, l, m, grid, cache=default_cache())
+            
+            print("Создание 3D модели...")
+            with profiling.span("фигура plotly"):
+                fig = create_isosurface_figure(meshes, n, l, m)
+            
+            print("Открытие визуализации в браузере...")
+            show_figure(fig, f"orbital_{n}_{l}_{m}.html")
+        print(f"Время: {trace.seconds * 1000:.0f} мс ({trace.summary()})")
         
         cont = input("\nВизуализировать другую орбиталь? (y/n): ").lower()
         if cont != 'y':
@@ -0,0 +1,103 @@
+import os
+import numpy as np
+
+from core.dynamics import Superposition
+from core.profiling import count, span
+from viz.plotter import BOHR_TO_ANGSTROM, volume_figure
+
+ORBITAL_NAMES = {0: 's', 1: 'p', 2: 'd', 3: 'f'}
+# Атомная единица времени (hbar / E_h) в фемтосекундах
+AU_TIME_FS = 2.4188843e-2
+
+
+def superposition_title(superposition: Superposition) -> str:
+    # "Суперпозиция 1s + 2p(m=0)" — коэффициенты не выводятся, они видны по динамике
+    terms = [f"{n}{ORBITAL_NAMES.get(l, '?')}" + (f"(m={m})" if l else "") for _, n, l, m in superposition.states]
+    return "Суперпозиция " + " + ".join(terms)
+
+
+def _quantized_frames(superposition: Superposition, times):
+    # Кадры в uint8 относительно общей для всех моментов оценки максимума: яркость сравнима между кадрами
+    scale = 255 / superposition.peak()
+    buffer = np.empty(superposition.grid.shape, dtype=superposition.grid.dtype)
+    for t, density in superposition.frames(times, buffer):
+        yield t, np.clip(density * scale, 0, 255).astype(np.uint8).ravel()
+
+
+def animation_figure(superposition: Superposition, times, fps: int = 12):
+    # Анимация Plotly: сетка (x, y, z) передается один раз в исходном трейсе, кадры несут только
+    # значения uint8 (plotly упаковывает их как типизированные массивы)
+    import plotly.graph_objects as go
+
+    grid = superposition.grid
+    coords = [np.broadcast_to(axis * np.float32(BOHR_TO_ANGSTROM), grid.shape).astype(np.float32).ravel()
+              for axis in (grid.x, grid.y, grid.z)]
+    with span("кадры"):
+        frames = list(_quantized_frames(superposition, times))
+    count("кадров", len(frames))
+
+    fig = volume_figure(0, 0, 0, title=superposition_title(superposition),
+                        x=coords[0], y=coords[1], z=coords[2], value=frames[0][1])
+    fig.update_traces(isomin=0.03 * 255, isomax=0.5 * 255, cmin=0, cmax=255, surface_count=12,
+                      colorbar=dict(title="Плотность", tickvals=[0, 63.75, 127.5, 191.25, 255],
+                                    ticktext=["0.00", "0.25", "0.50", "0.75", "1.00"], thickness=16, len=0.75))
+    fig.frames = [go.Frame(data=[go.Volume(value=value)], traces=[0], name=f"{index}")
+                  for index, (_, value) in enumerate(frames)]
+
+    duration = 1000 / fps
+    play = dict(frame=dict(duration=duration, redraw=True), fromcurrent=True, transition=dict(duration=0), mode="immediate")
+    fig.update_layout(
+        updatemenus=[dict(type="buttons", showactive=False, x=0.02, y=0.02, xanchor="left", yanchor="bottom",
+                          buttons=[dict(label="▶", method="animate", args=[None, play]),
+                                   dict(label="⏸", method="animate",
+                                        args=[[None], dict(frame=dict(duration=0, redraw=False), mode="immediate")])])],
+        sliders=[dict(x=0.12, y=0.02, len=0.85, currentvalue=dict(prefix="t = ", suffix=" фс"),
+                      steps=[dict(method="animate", label=f"{t * AU_TIME_FS:.3f}",
+                                  args=[[f"{index}"], dict(frame=dict(duration=0, redraw=True), mode="immediate")])
+                             for index, (t, _) in enumerate(frames)])],
+    )
+    return fig
+
+
+def write_video(path: str, superposition: Superposition, times, fps: int = 24, dpi: int = 100):
+    # Видео (.mp4 через ffmpeg или .gif через Pillow): плотность, проинтегрированная вдоль оси y,
+    # в плоскости x–z. Проекции всех кадров считаются заранее, чтобы шкала цвета была общей
+    from matplotlib import animation
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".gif":
+        writer = animation.PillowWriter(fps=fps)
+    elif animation.FFMpegWriter.isAvailable():
+        writer = animation.FFMpegWriter(fps=fps)
+    else:
+        raise ValueError("Для видео нужен ffmpeg; без него доступен только формат .gif")
+
+    grid = superposition.grid
+    buffer = np.empty(grid.shape, dtype=grid.dtype)
+    with span("кадры"):
+        projections = [density.sum(axis=0).T.copy() for _, density in superposition.frames(times, buffer)]
+    count("кадров", len(projections))
+    vmax = max(float(p.max()) for p in projections) or 1.0
+    limit = grid.extent * BOHR_TO_ANGSTROM
+
+    fig = Figure(figsize=(5, 5), dpi=dpi, facecolor='black')
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    ax.set_facecolor('black')
+    image = ax.imshow(projections[0], origin='lower', extent=[-limit, limit, -limit, limit], cmap='plasma',
+                      vmin=0, vmax=vmax, interpolation='bilinear')
+    ax.set_xlabel("x, Å", color='white')
+    ax.set_ylabel("z, Å", color='white')
+    ax.tick_params(colors='white')
+    title = ax.set_title(superposition_title(superposition), color='white', fontsize=11)
+
+    def update(index):
+        image.set_data(projections[index])
+        title.set_text(f"{superposition_title(superposition)}\nt = {times[index] * AU_TIME_FS:.3f} фс")
+        return image, title
+
+    with span("видео"):
+        animation.FuncAnimation(fig, update, frames=len(projections), blit=False).save(path, writer=writer, dpi=dpi)
+    return path
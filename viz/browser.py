@@ -0,0 +1,149 @@
+import base64
+import functools
+import http.server
+import json
+import os
+import tempfile
+import threading
+import webbrowser
+import numpy as np
+
+from core.grid import Grid
+from core.profiling import count, span
+from viz.plotter import BOHR_TO_ANGSTROM, normalized_volume, volume_figure
+
+DEFAULT_OUTPUT_DIR = os.environ.get("HVIZ_HTML_DIR") or os.path.join(tempfile.gettempdir(), "hydrogen_viz")
+# file — открыть HTML-файл напрямую, server — раздавать каталог локальным HTTP-сервером
+DEFAULT_MODE = os.environ.get("HVIZ_BROWSER_MODE", "file")
+PLOTLY_JS = "plotly.min.js"
+
+# Восстановление сетки и значений в браузере: x, y, z генерируются из origin + spacing, объем
+# приходит одним base64-буфером float32 или uint8 (доли максимума, квантованные на 255 уровней).
+# Порядок узлов совпадает с ravel() массива [y, x, z].
+_DECODE_SCRIPT = """
+(function() {
+    var payload = %s;
+    var raw = atob(payload.data);
+    var bytes = new Uint8Array(raw.length);
+    for (var i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+    var ny = payload.shape[0], nx = payload.shape[1], nz = payload.shape[2], total = ny * nx * nz;
+    var value;
+    if (payload.dtype === "uint8") {
+        value = new Float32Array(total);
+        for (var i = 0; i < total; i++) value[i] = bytes[i] / 255;
+    } else {
+        value = new Float32Array(bytes.buffer);
+    }
+    var x = new Float32Array(total), y = new Float32Array(total), z = new Float32Array(total);
+    var p = 0;
+    for (var a = 0; a < ny; a++)
+        for (var b = 0; b < nx; b++)
+            for (var c = 0; c < nz; c++, p++) {
+                x[p] = payload.origin[0] + b * payload.spacing;
+                y[p] = payload.origin[1] + a * payload.spacing;
+                z[p] = payload.origin[2] + c * payload.spacing;
+            }
+    Plotly.restyle("{plot_id}", {x: [x], y: [y], z: [z], value: [value]}, [0]);
+})();
+"""
+
+
+def volume_payload(density: np.ndarray, grid: Grid, sliced: bool = False, quantize: bool = True) -> dict:
+    # Объем в компактном виде: нормированные значения (uint8 или float32) в base64 и описание
+    # регулярной сетки вместо явных координат. Координаты — в ангстремах, как на осях графика
+    values = normalized_volume(density, grid.y, sliced)
+    if quantize:
+        data = np.round(np.clip(values, 0, 1) * 255).astype(np.uint8)
+    else:
+        data = values.astype('<f4')
+    origin = float(grid.lin[0]) * BOHR_TO_ANGSTROM
+    return {
+        "shape": list(data.shape),
+        "origin": [origin, origin, origin],
+        "spacing": grid.step * BOHR_TO_ANGSTROM,
+        "dtype": data.dtype.name,
+        "data": base64.b64encode(np.ascontiguousarray(data).tobytes()).decode("ascii"),
+    }
+
+
+def volume_html(density: np.ndarray, grid: Grid, n: int, l: int, m: int, sliced: bool = False,
+                quantize: bool = True, include_plotlyjs="cdn") -> str:
+    # HTML-страница с go.Volume, данные которой подставляются из бинарного буфера уже в браузере.
+    # include_plotlyjs — как в plotly.io.to_html: True (встроить), "cdn" или "directory"
+    fig = volume_figure(n, l, m, sliced, x=[], y=[], z=[], value=[])
+    with span("упаковка объема"):
+        payload = volume_payload(density, grid, sliced, quantize)
+    with span("сериализация"):
+        html = fig.to_html(include_plotlyjs=include_plotlyjs, post_script=_DECODE_SCRIPT % json.dumps(payload))
+    count("байт html", len(html))
+    return html
+
+
+def write_volume_html(path: str, density: np.ndarray, grid: Grid, n: int, l: int, m: int, sliced: bool = False,
+                      quantize: bool = True, standalone: bool = True):
+    # standalone=True — один самодостаточный файл (plotly.js встроен), иначе plotly.min.js
+    # кладется рядом один раз и переиспользуется всеми страницами каталога
+    directory = os.path.dirname(os.path.abspath(path))
+    if not standalone:
+        ensure_plotly_js(directory)
+    html = volume_html(density, grid, n, l, m, sliced, quantize, True if standalone else "directory")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+    return path
+
+
+def ensure_plotly_js(directory: str):
+    target = os.path.join(directory, PLOTLY_JS)
+    if not os.path.exists(target):
+        from plotly.offline import get_plotlyjs
+        os.makedirs(directory, exist_ok=True)
+        tmp = target + f".{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+        os.replace(tmp, target)
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def static_server(directory: str = DEFAULT_OUTPUT_DIR):
+    # Локальный HTTP-сервер (127.0.0.1, свободный порт) в фоновом потоке; один на процесс
+    global _server
+    with _server_lock:
+        if _server is None:
+            os.makedirs(directory, exist_ok=True)
+            handler = functools.partial(_QuietHandler, directory=directory)
+            _server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+        return _server
+
+
+def open_html(html: str, name: str, mode: str = None, directory: str = DEFAULT_OUTPUT_DIR) -> str:
+    # Сохраняет страницу в каталог вывода и открывает ее в браузере: файлом или через static_server
+    mode = mode or DEFAULT_MODE
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with span("запись html"), open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+    if mode == "server":
+        server = static_server(directory)
+        url = f"http://127.0.0.1:{server.server_address[1]}/{name}"
+    else:
+        url = "file://" + os.path.abspath(path)
+    webbrowser.open(url)
+    return url
+
+
+def show_figure(fig, name: str, mode: str = None):
+    # Любая фигура Plotly (например, изоповерхности) через тот же каталог и общий plotly.min.js
+    ensure_plotly_js(DEFAULT_OUTPUT_DIR)
+    with span("сериализация"):
+        html = fig.to_html(include_plotlyjs="directory")
+    count("байт html", len(html))
+    return open_html(html, name, mode)
@@ -0,0 +1,274 @@
+import json
+import os
+import struct
+import numpy as np
+
+from core.grid import Grid
+from core.parallel import parallel_probability_density, parallel_real_wavefunction
+from core.profiling import count, span
+
+DEFAULT_LEVELS = (0.05, 0.25, 0.6)
+POSITIVE_COLOR = (0.96, 0.42, 0.21)
+NEGATIVE_COLOR = (0.18, 0.53, 0.87)
+# Комплексная psi не делится на лепестки по знаку: поверхности |psi| одного цвета
+DENSITY_COLOR = (0.99, 0.76, 0.30)
+
+# Разбиение куба на 6 тетраэдров вокруг диагонали 0-7 (триангуляция Куна, согласована между соседями).
+# Угол куба c = 4 * d0 + 2 * d1 + d2, где d — смещение по осям массива [y, x, z]
+_CORNERS = np.array([(c >> 2 & 1, c >> 1 & 1, c & 1) for c in range(8)])
+_TETRAHEDRA = np.array([(0, 4, 6, 7), (0, 4, 5, 7), (0, 2, 6, 7), (0, 2, 3, 7), (0, 1, 5, 7), (0, 1, 3, 7)])
+_EDGES = [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)]
+
+
+def _case_triangles(case: int):
+    # Треугольники (тройки ребер тетраэдра) для маски вершин, лежащих внутри поверхности
+    inside = [v for v in range(4) if case >> v & 1]
+    outside = [v for v in range(4) if not case >> v & 1]
+    edge = lambda a, b: _EDGES.index((min(a, b), max(a, b)))
+    if len(inside) in (1, 3):
+        apex = inside[0] if len(inside) == 1 else outside[0]
+        others = [v for v in range(4) if v != apex]
+        return [[edge(apex, v) for v in others]]
+    if len(inside) == 2:
+        (a, b), (c, d) = inside, outside
+        return [[edge(a, c), edge(a, d), edge(b, d)], [edge(a, c), edge(b, d), edge(b, c)]]
+    return []
+
+
+_CASES = [_case_triangles(case) for case in range(16)]
+
+
+class Mesh:
+    # Треугольная сетка: вершины (V, 3) float32 в боровских радиусах, грани (F, 3) uint32
+    def __init__(self, vertices: np.ndarray, faces: np.ndarray, color=(1.0, 1.0, 1.0), opacity: float = 1.0,
+                 name: str = "mesh"):
+        self.vertices = vertices
+        self.faces = faces
+        self.color = color
+        self.opacity = opacity
+        self.name = name
+
+    @property
+    def nbytes(self) -> int:
+        return self.vertices.nbytes + self.faces.nbytes
+
+
+def marching_tetrahedra(field: np.ndarray, level: float, grid: Grid, name: str = "mesh") -> Mesh:
+    # Поверхность field = level на сетке grid (раскладка [y, x, z]); нормали граней направлены
+    # из области field > level наружу. Тетраэдры строятся только в кубах, пересекающих уровень.
+    shape = np.array(field.shape)
+    corners = np.stack([field[a:shape[0] - 1 + a, b:shape[1] - 1 + b, c:shape[2] - 1 + c] for a, b, c in _CORNERS])
+    active = np.argwhere((corners.max(axis=0) > level) & (corners.min(axis=0) <= level))
+    del corners
+    if not len(active):
+        return Mesh(np.zeros((0, 3), np.float32), np.zeros((0, 3), np.uint32), name=name)
+
+    # Глобальные индексы узлов для вершин тетраэдров: (K, 6, 4)
+    points = active[:, None, None, :] + _CORNERS[_TETRAHEDRA][None, :, :, :]
+    flat = np.ravel_multi_index(tuple(points[..., axis] for axis in range(3)), field.shape).reshape(-1, 4)
+    values = field.reshape(-1)[flat]
+    case = ((values > level) * (1 << np.arange(4))).sum(axis=1)
+
+    lin = grid.lin.astype(np.float64)
+    coords = lambda index: np.stack([lin[index[..., 1]], lin[index[..., 0]], lin[index[..., 2]]], axis=-1)
+    tet_points = points.reshape(-1, 4, 3)
+
+    keys, positions, inside_centers = [], [], []
+    for case_id, triangles in enumerate(_CASES):
+        selected = np.flatnonzero(case == case_id)
+        if not triangles or not len(selected):
+            continue
+        inside_mask = np.array([case_id >> v & 1 for v in range(4)], dtype=bool)
+        tet_coords = coords(tet_points[selected])
+        center = tet_coords[:, inside_mask].mean(axis=1)
+        for triangle in triangles:
+            corner_keys, corner_positions = [], []
+            for e in triangle:
+                a, b = _EDGES[e]
+                va, vb = values[selected, a], values[selected, b]
+                t = ((level - va) / (vb - va))[:, None]
+                corner_positions.append(tet_coords[:, a] + t * (tet_coords[:, b] - tet_coords[:, a]))
+                ga, gb = flat[selected, a], flat[selected, b]
+                corner_keys.append(np.minimum(ga, gb) * field.size + np.maximum(ga, gb))
+            keys.append(np.stack(corner_keys, axis=1).reshape(-1))
+            positions.append(np.stack(corner_positions, axis=1).reshape(-1, 3))
+            inside_centers.append(center)
+
+    # Вершины на общих ребрах решетки объединяются по ключу ребра
+    _, first, inverse = np.unique(np.concatenate(keys), return_index=True, return_inverse=True)
+    vertices = np.concatenate(positions)[first]
+    faces = inverse.reshape(-1, 3)
+
+    # Ориентация: нормаль грани смотрит от центра внутренних вершин тетраэдра
+    centers = np.concatenate(inside_centers)
+    tri = vertices[faces]
+    normal = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    flip = (normal * (tri.mean(axis=1) - centers)).sum(axis=1) < 0
+    faces[flip] = faces[flip][:, ::-1]
+    return Mesh(vertices.astype(np.float32), faces.astype(np.uint32), name=name)
+
+
+def decimate(mesh: Mesh, cell: float) -> Mesh:
+    # Упрощение кластеризацией вершин: вершины в одной ячейке размера cell сливаются в среднюю точку,
+    # вырожденные и повторяющиеся грани удаляются
+    if not len(mesh.faces) or cell <= 0:
+        return mesh
+    cells = np.floor(mesh.vertices / cell).astype(np.int64)
+    _, cluster = np.unique(cells, axis=0, return_inverse=True)
+    cluster = cluster.reshape(-1)
+    count = np.bincount(cluster)
+    vertices = np.stack([np.bincount(cluster, weights=mesh.vertices[:, axis]) for axis in range(3)], axis=1)
+    vertices /= count[:, None]
+    faces = cluster[mesh.faces]
+    keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+    faces = faces[keep]
+    _, unique_faces = np.unique(np.sort(faces, axis=1), axis=0, return_index=True)
+    faces = faces[np.sort(unique_faces)]
+    return Mesh(vertices.astype(np.float32), faces.astype(np.uint32), mesh.color, mesh.opacity, mesh.name)
+
+
+def orbital_isosurfaces(n: int, l: int, m: int, grid: Grid, levels=DEFAULT_LEVELS, cell: float = 1.5,
+                        real: bool = False, check=None, workers: int = None, cache=None,
+                        backend: str = None):
+    # Поверхности |psi|^2 = level * max |psi|^2. Комплексная psi (по умолчанию): поверхности |psi| одного
+    # цвета, для m != 0 — кольца вокруг оси z. real — вещественный базис (p_x, p_y, d_xy, ...): положительные
+    # и отрицательные лепестки psi строятся отдельно и окрашены по знаку.
+    # cell — размер ячейки упрощения в шагах сетки (0 — без упрощения); check() вызывается перед каждой
+    # поверхностью и прерывает построение исключением (core.scheduler.CancelToken.check).
+    # Поле считается слоями в пуле core.parallel (workers — число исполнителей); с cache (core.cache.DensityCache)
+    # повторный запрос той же орбитали и сетки читает его с диска; backend — core.backends (по умолчанию HVIZ_BACKEND)
+    compute_psi = lambda *args: parallel_real_wavefunction(*args, workers, backend=backend)
+    compute_density = lambda *args: parallel_probability_density(*args, workers, backend=backend)
+    with span("волновая функция"):
+        if real:
+            field = cache.real_wavefunction(n, l, m, grid, compute_psi) if cache else compute_psi(n, l, m, grid)
+            phases = ((1, POSITIVE_COLOR, "+"), (-1, NEGATIVE_COLOR, "-"))
+        else:
+            density = cache.density(n, l, m, grid, compute_density) if cache else compute_density(n, l, m, grid)
+            field = np.sqrt(density)
+            phases = ((1, DENSITY_COLOR, ""),)
+    peak = float(np.max(np.abs(field)))
+    meshes = []
+    if peak == 0:
+        return meshes
+    for index, level in enumerate(sorted(levels)):
+        opacity = 0.25 + 0.6 * index / max(len(levels) - 1, 1)
+        for sign, color, phase in phases:
+            if check is not None:
+                check()
+            with span("изоповерхности"):
+                mesh = marching_tetrahedra(sign * field, np.sqrt(level) * peak, grid, name=f"{phase}{level:g}")
+            with span("упрощение"):
+                mesh = decimate(mesh, cell * grid.step)
+            count("треугольников", len(mesh.faces))
+            if len(mesh.faces):
+                mesh.color, mesh.opacity = color, opacity
+                meshes.append(mesh)
+    return meshes
+
+
+def write_ply(path: str, meshes, scale: float = 1.0):
+    # Бинарный PLY: все сетки в одном файле, цвет и прозрачность — атрибуты вершин
+    vertices = np.concatenate([mesh.vertices for mesh in meshes]) * scale if meshes else np.zeros((0, 3))
+    colors = np.concatenate([
+        np.tile(np.round(np.array(tuple(mesh.color) + (mesh.opacity,)) * 255).astype(np.uint8), (len(mesh.vertices), 1))
+        for mesh in meshes
+    ]) if meshes else np.zeros((0, 4), np.uint8)
+    offsets = np.cumsum([0] + [len(mesh.vertices) for mesh in meshes])
+    faces = np.concatenate([mesh.faces + offset for mesh, offset in zip(meshes, offsets)]) if meshes else np.zeros((0, 3))
+
+    vertex_dtype = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+                             ('red', 'u1'), ('green', 'u1'), ('blue', 'u1'), ('alpha', 'u1')])
+    vertex_data = np.empty(len(vertices), dtype=vertex_dtype)
+    for axis, key in enumerate('xyz'):
+        vertex_data[key] = vertices[:, axis]
+    for channel, key in enumerate(('red', 'green', 'blue', 'alpha')):
+        vertex_data[key] = colors[:, channel]
+    face_data = np.empty(len(faces), dtype=np.dtype([('count', 'u1'), ('index', '<u4', (3,))]))
+    face_data['count'] = 3
+    face_data['index'] = faces
+
+    header = (
+        "ply\nformat binary_little_endian 1.0\n"
+        f"element vertex {len(vertex_data)}\n"
+        "property float x\nproperty float y\nproperty float z\n"
+        "property uchar red\nproperty uchar green\nproperty uchar blue\nproperty uchar alpha\n"
+        f"element face {len(face_data)}\n"
+        "property list uchar uint vertex_indices\nend_header\n"
+    )
+    with open(path, "wb") as f:
+        f.write(header.encode("ascii"))
+        f.write(vertex_data.tobytes())
+        f.write(face_data.tobytes())
+
+
+def write_obj(path: str, meshes, scale: float = 1.0):
+    # Текстовый OBJ: по группе на сетку, цвет вершин — в расширении "v x y z r g b"
+    with open(path, "w", encoding="ascii") as f:
+        offset = 1
+        for mesh in meshes:
+            f.write(f"o {mesh.name}\n")
+            rgb = " ".join(f"{c:.3f}" for c in mesh.color)
+            for vertex in mesh.vertices * scale:
+                f.write(f"v {vertex[0]:.5f} {vertex[1]:.5f} {vertex[2]:.5f} {rgb}\n")
+            for face in mesh.faces + offset:
+                f.write(f"f {face[0]} {face[1]} {face[2]}\n")
+            offset += len(mesh.vertices)
+
+
+def write_gltf(path: str, meshes, scale: float = 1.0):
+    # Бинарный glTF 2.0 (.glb): по узлу и материалу на сетку, позиции float32, индексы uint32
+    buffer = bytearray()
+    gltf = {"asset": {"version": "2.0", "generator": "hydrogen_viz"}, "scene": 0, "scenes": [{"nodes": []}],
+            "nodes": [], "meshes": [], "materials": [], "accessors": [], "bufferViews": [], "buffers": []}
+
+    def add_view(data: bytes, target: int):
+        while len(buffer) % 4:
+            buffer.append(0)
+        gltf["bufferViews"].append({"buffer": 0, "byteOffset": len(buffer), "byteLength": len(data), "target": target})
+        buffer.extend(data)
+        return len(gltf["bufferViews"]) - 1
+
+    for index, mesh in enumerate(meshes):
+        vertices = (mesh.vertices * scale).astype('<f4')
+        faces = mesh.faces.astype('<u4')
+        position_view = add_view(vertices.tobytes(), 34962)
+        index_view = add_view(faces.tobytes(), 34963)
+        gltf["accessors"].append({"bufferView": position_view, "componentType": 5126, "count": len(vertices),
+                                  "type": "VEC3", "min": vertices.min(axis=0).tolist(),
+                                  "max": vertices.max(axis=0).tolist()})
+        gltf["accessors"].append({"bufferView": index_view, "componentType": 5125, "count": faces.size,
+                                  "type": "SCALAR"})
+        gltf["materials"].append({"name": mesh.name, "doubleSided": True,
+                                  "alphaMode": "BLEND" if mesh.opacity < 1 else "OPAQUE",
+                                  "pbrMetallicRoughness": {"baseColorFactor": list(mesh.color) + [mesh.opacity],
+                                                           "metallicFactor": 0.0, "roughnessFactor": 0.6}})
+        gltf["meshes"].append({"name": mesh.name, "primitives": [
+            {"attributes": {"POSITION": 2 * index}, "indices": 2 * index + 1, "material": index}]})
+        gltf["nodes"].append({"mesh": index, "name": mesh.name})
+        gltf["scenes"][0]["nodes"].append(index)
+
+    while len(buffer) % 4:
+        buffer.append(0)
+    gltf["buffers"].append({"byteLength": len(buffer)})
+    if not buffer:
+        del gltf["buffers"], gltf["bufferViews"]
+    header = json.dumps(gltf, separators=(",", ":")).encode("utf-8")
+    header += b" " * (-len(header) % 4)
+    chunks = struct.pack("<II", len(header), 0x4E4F534A) + header
+    if buffer:
+        chunks += struct.pack("<II", len(buffer), 0x004E4942) + bytes(buffer)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<III", 0x46546C67, 2, 12 + len(chunks)))
+        f.write(chunks)
+
+
+_WRITERS = {".ply": write_ply, ".obj": write_obj, ".glb": write_gltf}
+
+
+def export_meshes(path: str, meshes, scale: float = 1.0):
+    # Формат выбирается по расширению: .ply, .obj или .glb
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in _WRITERS:
+        raise ValueError(f"Неизвестный формат сетки: {extension}")
+    _WRITERS[extension](path, meshes, scale)
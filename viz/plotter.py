@@ -1,14 +1,52 @@
-from matplotlib.figure import Figure
 import numpy as np
-import plotly.graph_objects as go
-from matplotlib import cm, colors as mcolors
+
+from core.profiling import count, span
+from core.sparse import BlockSparseDensity
+
+# plotly и matplotlib импортируются внутри функций: консольная версия не должна грузить matplotlib,
+# а окно GUI — ни один из движков до первой отрисовки
 
 BOHR_TO_ANGSTROM = 0.529177
 SLICE_HALF_BOHR_MIN = 0.25
+# Подписи вещественных орбиталей по (l, m), как в учебниках химии
+REAL_ORBITAL_SUFFIXES = {
+    (1, -1): "y", (1, 0): "z", (1, 1): "x",
+    (2, -2): "xy", (2, -1): "yz", (2, 0): "z²", (2, 1): "xz", (2, 2): "x²−y²",
+    (3, -3): "y(3x²−y²)", (3, -2): "xyz", (3, -1): "yz²", (3, 0): "z³", (3, 1): "xz²", (3, 2): "z(x²−y²)",
+    (3, 3): "x(x²−3y²)",
+}
+ORBITAL_NAMES = {0: 's', 1: 'p', 2: 'd', 3: 'f', 4: 'g'}
+# Цвета фазы, общие с изоповерхностями viz.mesh: psi < 0 — холодный, psi > 0 — теплый
+SIGNED_RGB = ((46, 135, 222), (20, 20, 20), (245, 107, 54))
+SIGNED_COLORSCALE = [[i / 2, f"rgb{rgb}"] for i, rgb in enumerate(SIGNED_RGB)]
 
 
 def create_orbital_figure(density: np.ndarray, X: np.ndarray, Y: np.ndarray, Z: np.ndarray, n: int, l: int, m: int,
-                          sliced: bool = False):
+                          sliced: bool = False, psi: np.ndarray = None):
+    # psi — вещественная волновая функция (core.physics.real_wavefunction_grid): лепестки окрашиваются по знаку
+    vol_data = normalized_volume(density, Y, sliced)
+    if psi is not None:
+        vol_data = np.copysign(vol_data, psi)
+    count("точек", vol_data.size)
+
+    # Переводим координаты в ангстремы для подписей осей; X, Y, Z могут быть разреженными (Grid)
+    x_ang = np.broadcast_to(X * BOHR_TO_ANGSTROM, density.shape).ravel()
+    y_ang = np.broadcast_to(Y * BOHR_TO_ANGSTROM, density.shape).ravel()
+    z_ang = np.broadcast_to(Z * BOHR_TO_ANGSTROM, density.shape).ravel()
+
+    with span("фигура plotly"):
+        return volume_figure(n, l, m, sliced, signed=psi is not None, x=x_ang, y=y_ang, z=z_ang, value=vol_data.ravel())
+
+def real_orbital_name(n: int, l: int, m: int) -> str:
+    # "2p_x", "3d_xy"; для l >= 4 — "5g (m=-1)"
+    orb_char = ORBITAL_NAMES.get(l, '?')
+    if l == 0:
+        return f"{n}{orb_char}"
+    suffix = REAL_ORBITAL_SUFFIXES.get((l, m))
+    return f"{n}{orb_char}_{suffix}" if suffix else f"{n}{orb_char} (m={m})"
+
+def normalized_volume(density: np.ndarray, Y: np.ndarray, sliced: bool = False) -> np.ndarray:
+    # Плотность в долях максимума; для среза обнуляется все, что дальше полутора вокселей от плоскости y = 0
     max_val = np.max(density)
     vol_data = density / max_val if max_val > 0 else density
 
@@ -20,44 +58,43 @@ def create_orbital_figure(density: np.ndarray, X: np.ndarray, Y: np.ndarray, Z:
             voxel = SLICE_HALF_BOHR_MIN
         half_width = max(SLICE_HALF_BOHR_MIN, voxel * 1.5)
 
-        vol_data = vol_data.copy()
-        vol_data[np.abs(Y) > half_width] = 0
+        vol_data = np.where(np.abs(Y) > half_width, 0, vol_data)
+    return vol_data
 
-    orbital_names = {0: 's', 1: 'p', 2: 'd', 3: 'f'}
-    orb_char = orbital_names.get(l, '?')
+def volume_figure(n: int, l: int, m: int, sliced: bool = False, title: str = None, signed: bool = False, **data):
+    # Фигура go.Volume с оформлением орбитали; data — x, y, z, value (могут быть пустыми и
+    # подставляться позже на стороне браузера, см. viz.browser).
+    # signed — value = sign(psi) * |psi|^2 / max в [-1, 1]: расходящаяся шкала, окрестность нуля прозрачна
+    import plotly.graph_objects as go
 
-    # Переводим координаты в ангстремы для подписей осей
-    x_ang = (X * BOHR_TO_ANGSTROM).flatten()
-    y_ang = (Y * BOHR_TO_ANGSTROM).flatten()
-    z_ang = (Z * BOHR_TO_ANGSTROM).flatten()
+    orb_char = ORBITAL_NAMES.get(l, '?')
+    if title is None:
+        name = real_orbital_name(n, l, m) if signed else f"{n}{orb_char} (m={m})"
+        title = f"Орбиталь {name} {'[СРЕЗ]' if sliced else ''}"
+
+    if signed:
+        scale = dict(isomin=-0.5, isomax=0.5, colorscale=SIGNED_COLORSCALE, cmin=-1, cmax=1,
+                     opacityscale=[[0, 1], [0.485, 1], [0.5, 0], [0.515, 1], [1, 1]],
+                     colorbar=dict(title="Фаза · плотность", tickformat=".1f", tickvals=[-1, -0.5, 0, 0.5, 1],
+                                   thickness=16, len=0.75))
+    else:
+        scale = dict(isomin=0.03, isomax=0.5, colorscale="Viridis", cmin=0, cmax=1,
+                     colorbar=dict(title="Плотность", tickformat=".2f", tickvals=[0, 0.25, 0.5, 0.75, 1],
+                                   thickness=16, len=0.75))
 
     fig = go.Figure(
         data=go.Volume(
-            x=x_ang,
-            y=y_ang,
-            z=z_ang,
-            value=vol_data.flatten(),
-            isomin=0.03,
-            isomax=0.5,
+            **data,
+            **scale,
             opacity=0.15,
             surface_count=25,
-            colorscale="Viridis",
-            cmin=0,
-            cmax=1,
             caps=dict(x_show=False, y_show=False, z_show=False),
             showscale=True,
-            colorbar=dict(
-                title="Плотность",
-                tickformat=".2f",
-                tickvals=[0, 0.25, 0.5, 0.75, 1],
-                thickness=16,
-                len=0.75,
-            ),
         )
     )
 
     fig.update_layout(
-        title=f"Орбиталь {n}{orb_char} (m={m}) {'[СРЕЗ]' if sliced else ''}",
+        title=title,
         scene=dict(
             bgcolor="black",
             xaxis_title="x, Å",
@@ -71,21 +108,171 @@ def create_orbital_figure(density: np.ndarray, X: np.ndarray, Y: np.ndarray, Z:
     )
     return fig
 
-def create_orbital_figure_matplotlib(density: np.ndarray, X: np.ndarray, Y: np.ndarray, Z: np.ndarray, n: int, l: int, m: int):
+def create_isosurface_figure(meshes, n: int, l: int, m: int, real: bool = False):
+    # Изоповерхности из viz.mesh: по go.Mesh3d на лепесток и уровень вместо облака всех узлов сетки
+    import plotly.graph_objects as go
+
+    orb_char = ORBITAL_NAMES.get(l, '?')
+
+    traces = []
+    for mesh in meshes:
+        vertices = mesh.vertices * np.float32(BOHR_TO_ANGSTROM)
+        r, g, b = (int(round(c * 255)) for c in mesh.color)
+        traces.append(go.Mesh3d(
+            x=vertices[:, 0], y=vertices[:, 1], z=vertices[:, 2],
+            i=mesh.faces[:, 0], j=mesh.faces[:, 1], k=mesh.faces[:, 2],
+            color=f"rgb({r},{g},{b})",
+            opacity=mesh.opacity,
+            name=mesh.name,
+            flatshading=False,
+            lighting=dict(ambient=0.5, diffuse=0.8, specular=0.3, roughness=0.6),
+            hoverinfo="name",
+        ))
+
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        title=f"Орбиталь {real_orbital_name(n, l, m) if real else f'{n}{orb_char} (m={m})'}",
+        scene=dict(
+            bgcolor="black",
+            xaxis_title="x, Å",
+            yaxis_title="y, Å",
+            zaxis_title="z, Å",
+            aspectmode="data",
+        ),
+        paper_bgcolor="black",
+        font=dict(color="white"),
+        margin=dict(l=0, r=0, b=0, t=30)
+    )
+    return fig
+
+def create_slice_figure(plane_slice, n: int, l: int, m: int, scale: float = None, real: bool = False,
+                        contours: int = 8):
+    # Срез core.slicing как тепловая карта с изолиниями; scale — общий масштаб (core.slicing.peak_value),
+    # по умолчанию — максимум самого среза. Знаковые значения — в расходящейся шкале фазы
+    import plotly.graph_objects as go
+
+    values, coords = _normalized_slice(plane_slice, scale)
+    axis = coords * BOHR_TO_ANGSTROM
+    u_name, v_name = _slice_axis_names(plane_slice.plane)
+    if plane_slice.signed:
+        colors = dict(colorscale=SIGNED_COLORSCALE, zmin=-1, zmax=1, zmid=0)
+        title = "ψ / max |ψ|"
+    else:
+        colors = dict(colorscale="Viridis", zmin=0, zmax=1)
+        title = "Плотность"
+    count("точек", values.size)
+
+    with span("фигура plotly"):
+        fig = go.Figure(go.Heatmap(z=values, x=axis, y=axis, **colors,
+                                   colorbar=dict(title=title, thickness=16, len=0.75)))
+        if contours:
+            # Изолиниям хватает ~256 узлов по стороне: полная решетка удвоила бы размер страницы
+            low = -1 if plane_slice.signed else 0
+            step = max(1, len(axis) // 256)
+            fig.add_trace(go.Contour(z=values[::step, ::step], x=axis[::step], y=axis[::step], showscale=False,
+                                     hoverinfo="skip",
+                                     contours=dict(coloring="none", start=low, end=1, size=(1 - low) / (contours + 1)),
+                                     line=dict(color="rgba(255,255,255,0.35)", width=1)))
+        name = real_orbital_name(n, l, m) if real else f"{n}{ORBITAL_NAMES.get(l, '?')} (m={m})"
+        fig.update_layout(
+            title=f"Орбиталь {name}, срез {plane_slice.plane.label()}",
+            xaxis=dict(title=f"{u_name}, Å", scaleanchor="y", constrain="domain"),
+            yaxis=dict(title=f"{v_name}, Å", constrain="domain"),
+            plot_bgcolor="black",
+            paper_bgcolor="black",
+            font=dict(color="white"),
+            margin=dict(l=60, r=20, b=50, t=40),
+        )
+    return fig
+
+def create_slice_figure_matplotlib(plane_slice, n: int, l: int, m: int, scale: float = None, real: bool = False):
+    # Двумерный срез для окна приложения; при движении плоскости фигура не пересоздается,
+    # а обновляется через update_slice_figure_matplotlib
+    from matplotlib import colors as mcolors
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(6, 6), dpi=100, facecolor='black')
+    ax = fig.add_subplot(111)
+    ax.set_facecolor('black')
+    if plane_slice.signed:
+        cmap = mcolors.LinearSegmentedColormap.from_list("phase", [tuple(c / 255 for c in rgb) for rgb in SIGNED_RGB])
+        vmin, label = -1, "ψ / max |ψ|"
+    else:
+        cmap, vmin, label = 'viridis', 0, "Отн. плотность"
+    limit = plane_slice.extent * BOHR_TO_ANGSTROM
+    image = ax.imshow(np.zeros((2, 2)), origin='lower', extent=[-limit, limit, -limit, limit], cmap=cmap,
+                      vmin=vmin, vmax=1, interpolation='bilinear')
+    cbar = fig.colorbar(image, ax=ax, shrink=0.75, pad=0.02, label=label)
+    cbar.ax.yaxis.label.set_color("white")
+    cbar.ax.tick_params(colors="white")
+    ax.tick_params(colors='white')
+    update_slice_figure_matplotlib(fig, plane_slice, n, l, m, scale, real)
+    return fig
+
+def update_slice_figure_matplotlib(fig, plane_slice, n: int, l: int, m: int, scale: float = None, real: bool = False,
+                                   contours: int = 6):
+    # Подменяет данные изображения и перестраивает изолинии; оси, шкала и холст остаются прежними
+    ax = fig.axes[0]
+    values, _ = _normalized_slice(plane_slice, scale)
+    limit = plane_slice.extent * BOHR_TO_ANGSTROM
+    image = ax.images[0]
+    image.set_data(values)
+    image.set_extent([-limit, limit, -limit, limit])
+    for collection in list(ax.collections):
+        collection.remove()
+    if contours:
+        with span("изолинии"):
+            low = -1 if plane_slice.signed else 0
+            levels = [level for level in np.linspace(low, 1, contours + 2)[1:-1] if level != 0]
+            ax.contour(values, levels=levels, origin='lower', extent=[-limit, limit, -limit, limit],
+                       colors='white', linewidths=0.5, alpha=0.35)
+    u_name, v_name = _slice_axis_names(plane_slice.plane)
+    ax.set_xlabel(f"{u_name}, Å", color='white')
+    ax.set_ylabel(f"{v_name}, Å", color='white')
+    name = real_orbital_name(n, l, m) if real else f"{n}{ORBITAL_NAMES.get(l, '?')} (m={m})"
+    ax.set_title(f"Орбиталь {name}, {plane_slice.plane.label()}", color='white', fontsize=12)
+    count("точек", values.size)
+    return fig
+
+def _normalized_slice(plane_slice, scale: float = None):
+    values = plane_slice.values
+    if scale is None:
+        scale = float(np.max(np.abs(values)))
+    return (values / np.float32(scale) if scale > 0 else values), plane_slice.coords
+
+def _slice_axis_names(plane):
+    # Подписи экранных осей: имена координат для плоскостей вдоль осей, иначе u и v
+    names = {"x": ("y", "z"), "y": ("x", "z"), "z": ("x", "y")}
+    return names.get(plane.axis_name, ("u", "v"))
+
+def create_orbital_figure_matplotlib(density: np.ndarray, X: np.ndarray, Y: np.ndarray, Z: np.ndarray, n: int, l: int, m: int,
+                                     psi: np.ndarray = None):
+    # psi — вещественная волновая функция той же формы: точки окрашиваются по знаку фазы.
+    # density может быть разреженной (core.sparse.BlockSparseDensity): точки берутся прямо из кирпичей,
+    # X, Y, Z тогда не используются
+    from matplotlib.figure import Figure
+
     fig = Figure(figsize=(6, 6), dpi=100, facecolor='black')
     ax = fig.add_subplot(111, projection='3d')
     ax.set_facecolor('black')
     
-    max_val = np.max(density)
-    vol_data = density / max_val if max_val > 0 else density
+    signs = None
+    with span("отбор точек"):
+        if isinstance(density, BlockSparseDensity):
+            x_vis, y_vis, z_vis, v_vis = density.points(0.05)
+        else:
+            max_val = np.max(density)
+            vol_data = density / max_val if max_val > 0 else density
 
-    mask = vol_data > 0.05
-    x_vis, y_vis, z_vis, v_vis = X[mask], Y[mask], Z[mask], vol_data[mask]
+            mask = vol_data > 0.05
+            x_vis, y_vis, z_vis = (np.broadcast_to(c, density.shape)[mask] for c in (X, Y, Z))
+            v_vis = vol_data[mask]
+            if psi is not None:
+                signs = np.sign(psi[mask])
 
-    if len(x_vis) > 0:
-        max_points = 100000
-        
-        if len(x_vis) > max_points:
+    max_points = 100000
+    if len(x_vis) > max_points:
+        with span("прореживание"):
             v_normalized = v_vis / np.max(v_vis)
             probabilities = 0.1 + 0.9 * v_normalized
             probabilities = probabilities / np.sum(probabilities)
@@ -94,7 +281,33 @@ def create_orbital_figure_matplotlib(density: np.ndarray, X: np.ndarray, Y: np.n
             y_vis = y_vis[indices]
             z_vis = z_vis[indices]
             v_vis = v_vis[indices]
-        
+            if signs is not None:
+                signs = signs[indices]
+
+    _draw_cloud(fig, ax, x_vis, y_vis, z_vis, v_vis, n, l, signs=signs, m=m)
+    return fig
+
+def create_cloud_figure_matplotlib(x: np.ndarray, y: np.ndarray, z: np.ndarray, values: np.ndarray, n: int, l: int, m: int):
+    # Облако точек, выбранных по |psi|^2 (core.sampling): сетка и прореживание не нужны
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(6, 6), dpi=100, facecolor='black')
+    ax = fig.add_subplot(111, projection='3d')
+    ax.set_facecolor('black')
+
+    max_val = np.max(values) if len(values) else 0
+    v_vis = values / max_val if max_val > 0 else values
+    # Редкие точки далекого хвоста не должны определять масштаб осей
+    limit = np.quantile(np.abs(np.concatenate((x, y, z))), 0.995) * BOHR_TO_ANGSTROM * 1.15 if len(x) else None
+    _draw_cloud(fig, ax, x, y, z, v_vis, n, l, limit=limit)
+    return fig
+
+def _draw_cloud(fig, ax, x_vis, y_vis, z_vis, v_vis, n: int, l: int, limit: float = None, signs: np.ndarray = None,
+                m: int = 0):
+    # signs (+1/-1 на точку) переключает шкалу на расходящуюся: яркость — плотность, оттенок — знак psi
+    from matplotlib import cm, colors as mcolors
+
+    if len(x_vis) > 0:
         v_enhanced = np.power(v_vis, 0.5)
         v_normalized = (v_enhanced - np.min(v_enhanced)) / (np.max(v_enhanced) - np.min(v_enhanced) + 1e-10)
         
@@ -105,48 +318,57 @@ def create_orbital_figure_matplotlib(density: np.ndarray, X: np.ndarray, Y: np.n
         brightness_coeff = 0.4 + norm_depth * 1.2
         alphas = 0.4 + 0.5 * v_normalized
         
-        cmap = cm.get_cmap('plasma')
-        colors = cmap(v_normalized)
+        if signs is None:
+            cmap, norm = cm.get_cmap('plasma'), mcolors.Normalize(vmin=0, vmax=1)
+            colors = cmap(v_normalized)
+        else:
+            cmap = mcolors.LinearSegmentedColormap.from_list(
+                "phase", [(r / 255, g / 255, b / 255) for r, g, b in SIGNED_RGB])
+            norm = mcolors.Normalize(vmin=-1, vmax=1)
+            colors = cmap(0.5 + 0.5 * signs * (0.25 + 0.75 * v_normalized))
         final_alphas = alphas * brightness_coeff
         final_alphas = np.clip(final_alphas, 0.0, 1.0)
         colors[:, 3] = final_alphas
 
         marker_size = max(3, min(15, 50000 / len(x_vis)))
 
+        count("точек", len(x_vis))
         x_vis_ang = x_vis * BOHR_TO_ANGSTROM
         y_vis_ang = y_vis * BOHR_TO_ANGSTROM
         z_vis_ang = z_vis * BOHR_TO_ANGSTROM
         
-        ax.scatter(
-            x_vis_ang,
-            y_vis_ang,
-            z_vis_ang,
-            c=colors,
-            s=marker_size,
-            marker='o',
-            edgecolors='none',
-            depthshade=False,
-        )
+        with span("scatter"):
+            ax.scatter(
+                x_vis_ang,
+                y_vis_ang,
+                z_vis_ang,
+                c=colors,
+                s=marker_size,
+                marker='o',
+                edgecolors='none',
+                depthshade=False,
+            )
         
         ax.scatter([0], [0], [0], color='red', s=45, edgecolors='white', linewidth=0.8)
         
-        limit = np.max(np.abs(x_vis_ang)) * 1.15
+        if limit is None:
+            limit = np.max(np.abs(x_vis_ang)) * 1.15
         
         ax.set_xlim(-limit, limit)
         ax.set_ylim(-limit, limit)
         ax.set_zlim(-limit, limit)
 
-        mappable = cm.ScalarMappable(norm=mcolors.Normalize(vmin=0, vmax=1), cmap=cmap)
+        mappable = cm.ScalarMappable(norm=norm, cmap=cmap)
         mappable.set_array([])
-        cbar = fig.colorbar(mappable, ax=ax, shrink=0.65, pad=0.02, label="Отн. плотность")
+        label = "Отн. плотность" if signs is None else "Знак ψ · отн. плотность"
+        cbar = fig.colorbar(mappable, ax=ax, shrink=0.65, pad=0.02, label=label)
         cbar.ax.yaxis.label.set_color("white")
         cbar.ax.tick_params(colors="white")
     else:
         ax.text(0, 0, 0, "Нет данных", color='white', ha='center')
 
     ax.set_axis_off()
-    orbital_names = {0: 's', 1: 'p', 2: 'd', 3: 'f'}
-    orb_char = orbital_names.get(l, '?')
-    ax.set_title(f"Орбиталь {n}{orb_char} (коорд. в Å)", color='white', fontsize=12, y=0.95)
-    
-    return fig
+    orb_char = ORBITAL_NAMES.get(l, '?')
+    name = f"{n}{orb_char}" if signs is None else real_orbital_name(n, l, m)
+    ax.set_title(f"Орбиталь {name} (коорд. в Å)", color='white', fontsize=12, y=0.95)
+
@@ -0,0 +1,148 @@
+import heapq
+import itertools
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from core.cache import DEFAULT_CACHE_DIR
+
+# Меняется при любом изменении вида превью, чтобы старые PNG не подхватывались
+THUMBNAIL_VERSION = 1
+DEFAULT_THUMBNAIL_WORKERS = int(os.environ.get("HVIZ_THUMBNAIL_WORKERS", 0)) or max(1, min(4, (os.cpu_count() or 2) - 1))
+DEFAULT_THUMBNAIL_POINTS = 12000
+
+
+def render_thumbnail(n: int, l: int, m: int, width: int = 220, height: int = 100,
+                     points: int = DEFAULT_THUMBNAIL_POINTS) -> bytes:
+    # PNG превью орбитали. Выполняется в процессе пула: облако выбирается прямо из |psi|^2 без сетки,
+    # зерно фиксировано, чтобы превью не менялось между запусками
+    import numpy as np
+    from matplotlib import cm
+    from matplotlib.figure import Figure
+    from PIL import Image
+    from core.sampling import sample_orbital_points
+
+    x_vis, y_vis, z_vis, v_vis = sample_orbital_points(n, l, m, points, seed=0)
+    fig = Figure(figsize=(width / 100, height / 100), dpi=150, facecolor='black')
+    ax = fig.add_subplot(111, projection='3d')
+    ax.set_facecolor('black')
+    if len(x_vis) > 0:
+        v_vis = v_vis / np.max(v_vis)
+        v_enhanced = np.power(v_vis, 0.5)
+        v_normalized = (v_enhanced - np.min(v_enhanced)) / (np.max(v_enhanced) - np.min(v_enhanced) + 1e-10)
+        cmap = cm.get_cmap('plasma')
+        colors = cmap(v_normalized)
+        colors[:, 3] = np.clip(0.4 + 0.4 * v_normalized, 0.1, 0.8)
+        ax.scatter(x_vis, y_vis, z_vis, c=colors, s=3, marker='o', edgecolors='none', depthshade=False)
+        ax.scatter([0], [0], [0], color='red', s=12, edgecolors='white', linewidth=0.6)
+        limit = np.quantile(np.abs(x_vis), 0.995) * 1.1
+        ax.set_xlim(-limit, limit)
+        ax.set_ylim(-limit, limit)
+        ax.set_zlim(-limit, limit)
+    ax.set_axis_off()
+    fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
+    buf = BytesIO()
+    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight', pad_inches=0, facecolor='black')
+    buf.seek(0)
+    img = Image.open(buf).resize((width, height), Image.Resampling.LANCZOS)
+    out = BytesIO()
+    img.save(out, format='png')
+    return out.getvalue()
+
+
+class ThumbnailService:
+    # Превью для карточек галереи: готовые PNG берутся из версионированного каталога на диске,
+    # недостающие рисуются в пуле процессов. В пул одновременно отдается не больше workers задач,
+    # остальные ждут в очереди с приоритетом (меньше — раньше), так что видимые карточки идут первыми.
+    # callback(path) вызывается из служебного потока; path = None, если отрисовка не удалась
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, workers: int = DEFAULT_THUMBNAIL_WORKERS):
+        self.directory = os.path.join(directory, "thumbnails", f"v{THUMBNAIL_VERSION}")
+        self.workers = workers
+        self._heap = []
+        self._priority = {}
+        self._callbacks = {}
+        self._running = 0
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._closed = False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError:
+            # Каталог кэша недоступен: превью живут до перезагрузки во временном каталоге
+            self.directory = os.path.join(tempfile.gettempdir(), "hydrogen_viz", "thumbnails", f"v{THUMBNAIL_VERSION}")
+            os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, n: int, l: int, m: int, width: int, height: int) -> str:
+        return os.path.join(self.directory, f"{n}_{l}_{m}_{width}x{height}.png")
+
+    def cached(self, n: int, l: int, m: int, width: int, height: int):
+        path = self.path(n, l, m, width, height)
+        return path if os.path.exists(path) else None
+
+    def request(self, n: int, l: int, m: int, width: int, height: int, callback, priority: int = 0):
+        # Повторный запрос той же картинки добавляет callback и может только повысить приоритет
+        key = (n, l, m, width, height)
+        path = self.cached(*key)
+        if path:
+            callback(path)
+            return
+        with self._lock:
+            if self._closed:
+                return
+            self._callbacks.setdefault(key, []).append(callback)
+            if key in self._priority and self._priority[key] <= priority:
+                return
+            self._priority[key] = priority
+            heapq.heappush(self._heap, (priority, next(self._counter), key))
+        self._dispatch()
+
+    def _dispatch(self):
+        submitted = []
+        with self._lock:
+            while self._heap and self._running < self.workers and not self._closed:
+                priority, _, key = heapq.heappop(self._heap)
+                # Записи, вытесненные более высоким приоритетом или уже отданные в пул, пропускаются
+                if self._priority.get(key) != priority:
+                    continue
+                self._priority[key] = float("-inf")
+                if self._pool is None:
+                    # Пул создается из служебного потока процесса с окном Tk (и, возможно, потоками numba):
+                    # fork такого процесса может зависнуть, поэтому процессы запускаются через spawn
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+                self._running += 1
+                submitted.append((key, self._pool.submit(render_thumbnail, *key)))
+        # done-callback может сработать сразу, поэтому навешивается вне блокировки
+        for key, future in submitted:
+            future.add_done_callback(lambda f, key=key: self._finished(key, f))
+
+    def _finished(self, key, future):
+        path = None
+        try:
+            data = future.result()
+            path = self.path(*key)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except Exception:
+            path = None
+        with self._lock:
+            self._running -= 1
+            self._priority.pop(key, None)
+            callbacks = self._callbacks.pop(key, [])
+        for callback in callbacks:
+            callback(path)
+        self._dispatch()
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            self._heap.clear()
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)